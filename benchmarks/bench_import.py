@@ -0,0 +1,68 @@
+"""Start up time of a one-shot command using the library
+Runs every snippet in a fresh interpreter several times and reports the median wall time,
+then lists the slowest imports of the last one (python -X importtime).
+run from the repository root:
+    python -m benchmarks.bench_import [runs]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+SNIPPETS = {
+    'interpreter': 'pass',
+    'import CognosAnalyticsService':
+        'from services.cognos_analytics import CognosAnalyticsService',
+    'create service, use users':
+        'from services.cognos_analytics import CognosAnalyticsService\n'
+        'ca_service = CognosAnalyticsService(ca_url="http://localhost:9300")\n'
+        'ca_service.users',
+    'create service, use all':
+        'from services.cognos_analytics import CognosAnalyticsService\n'
+        'ca_service = CognosAnalyticsService(ca_url="http://localhost:9300")\n'
+        'for name in ("users", "groups", "roles", "namespaces", "report_data", "content"):\n'
+        '    getattr(ca_service, name)',
+}
+
+_IMPORT_TIME = re.compile(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)')
+
+
+def run(code: str, runs: int) -> float:
+    """median wall seconds of running the code in a new interpreter"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=os.getcwd())
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def slowest_imports(code: str, count: int = 15) -> [tuple]:
+    """(cumulative microseconds, module) of the slowest imports of the snippet
+    and of the modules it imports directly"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            check=True, capture_output=True, text=True, cwd=os.getcwd())
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        # one space of indent is a module imported by the snippet, three by those modules
+        if match is not None and len(match.group(2)) <= 3:
+            imports.append((int(match.group(1)), match.group(3)))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main(runs: int = 10):
+    baseline = None
+    for name, code in SNIPPETS.items():
+        elapsed = run(code, runs)
+        baseline = elapsed if baseline is None else baseline
+        print(f'{name:<32} {elapsed * 1000:>8.1f} ms  (+{(elapsed - baseline) * 1000:.1f} ms)')
+    print('slowest imports:')
+    for micros, module in slowest_imports(SNIPPETS['create service, use users']):
+        print(f'  {module:<40} {micros / 1000:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
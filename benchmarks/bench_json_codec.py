@@ -0,0 +1,59 @@
+"""Benchmark of the JSON codecs on Cognos Analytics shaped payloads
+run from the repository root:
+    python -m benchmarks.bench_json_codec [number of objects]
+"""
+import sys
+import time
+
+from services.json_codec import JsonCodec, OrjsonCodec, UjsonCodec
+from benchmarks.bench_models import group_listing, content_listing
+
+
+def report_payload(count: int) -> dict:
+    """DataSetJSON output of a list report"""
+    return {'dataSet': {'dataTable': [{'id': 'List1', 'row': [
+        {'Region': f'Region {i % 20}', 'Product line': f'Line {i % 7}',
+         'Order date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+         'Quantity': i % 1000, 'Revenue': i * 1.37}
+        for i in range(count)]}]}}
+
+
+def codecs() -> [JsonCodec]:
+    """all the installed codecs"""
+    available = [JsonCodec()]
+    for codec_class in (OrjsonCodec, UjsonCodec):
+        try:
+            available.append(codec_class())
+        except ImportError:
+            print(f'{codec_class.name} is not installed')
+    return available
+
+
+def timed(func, repeat: int = 3) -> float:
+    """best time of a few runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(count: int = 100000):
+    payloads = {'groups listing': {'groups': group_listing(count)},
+                'content with policies': {'content': content_listing(count)},
+                'DataSetJSON report': report_payload(count)}
+    available = codecs()
+    for name, payload in payloads.items():
+        encoded = JsonCodec().dumps(payload)
+        print(f'{name}: {count:,} objects, {len(encoded) / 1024 / 1024:.1f} MB')
+        for codec in available:
+            decode = timed(lambda codec=codec: codec.loads(encoded))
+            encode = timed(lambda codec=codec: codec.dumps(payload))
+            print(f'  {codec.name:<8} loads {len(encoded) / decode / 1024 / 1024:>8.1f} MB/s'
+                  f'   dumps {len(encoded) / encode / 1024 / 1024:>8.1f} MB/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
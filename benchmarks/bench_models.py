@@ -0,0 +1,61 @@
+"""Micro-benchmark of building model objects from REST listings
+run from the repository root:
+    python -m benchmarks.bench_models [number of objects]
+"""
+import sys
+import time
+from dataclasses import fields
+
+from objects.group import Group
+from objects.content_object import ContentObject
+
+
+def group_listing(count: int) -> [dict]:
+    """dicts shaped like the /api/v1/groups response"""
+    return [{'id': f'g{i}', 'type': 'group', 'defaultName': f'Group {i}',
+             'searchPath': f'CAMID("ns:g:{i}")', 'modificationTime': '2024-01-01T00:00:00.000Z',
+             'defaultDescription': '', 'hidden': False, 'disabled': False,
+             'tenantID': '', 'version': 1, 'links': None, 'policies': None,
+             'ancestors': [], 'owner': None}
+            for i in range(count)]
+
+
+def content_listing(count: int) -> [dict]:
+    """dicts shaped like /api/v1/content/{id} responses with policies"""
+    return [{'id': f'c{i}', 'type': 'report', 'defaultName': f'Report {i}',
+             'modificationTime': '2024-01-01T00:00:00.000Z',
+             'policies': [{'securityObject': {'searchPath': 'CAMID("::Everyone")',
+                                              'type': 'group'},
+                           'permissions': [{'name': 'read', 'access': 'grant'},
+                                           {'name': 'traverse', 'access': 'grant'}]}]}
+            for i in range(count)]
+
+
+def field_filter(listing: [dict]) -> list:
+    """the per item field lookup the services used to do"""
+    return [Group(**{k: v for k, v in grp.items() if k in set(f.name for f in fields(Group))})
+            for grp in listing]
+
+
+def run(name: str, func, listing: [dict]):
+    """time one way of building the objects"""
+    start = time.perf_counter()
+    result = func(listing)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<40} {len(result) / elapsed:>12,.0f} objects/s  {elapsed:.3f}s')
+
+
+def main(count: int = 100000):
+    groups = group_listing(count)
+    contents = content_listing(count)
+    print(f'Building {count:,} objects')
+    run('Group: field set per item (before)', field_filter, groups)
+    run('Group.from_dict', lambda listing: [Group.from_dict(grp) for grp in listing], groups)
+    objects = [Group.from_dict(grp) for grp in groups]
+    run('Group.to_dict', lambda items: [item.to_dict() for item in items], objects)
+    run('ContentObject.from_dict with policies',
+        lambda listing: [ContentObject.from_dict(obj) for obj in listing], contents)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
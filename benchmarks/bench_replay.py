@@ -0,0 +1,84 @@
+"""Replay a recorded RestService session to profile the client side
+Sends the recorded requests again in their original order through a RestService
+answered by a ReplayAdapter, and reports the client CPU time, peak Python memory
+and latency per request, so library changes can be compared on identical traffic.
+Only the RestService layer is exercised, the services that made the calls are not.
+record a session with services.recording.record, then run from the repository root:
+    python -m benchmarks.bench_replay nightly_job.jsonl.gz [--time-scale 0] [--workers 1]
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from services.recording import load_recording, replay
+from services.rest import RestService
+
+# base url of the replayed session, requests never leave the process
+REPLAY_URL = 'http://replay'
+
+
+def replay_requests(path: str, time_scale: float, workers: int) -> [float]:
+    """ send the recorded requests, returns the latency of every request"""
+    exchanges = list(load_recording(path))
+    rest = RestService(ca_url=REPLAY_URL, pool_maxsize=workers)
+    replay(rest, path, time_scale=time_scale)
+
+    def send(exchange: dict) -> float:
+        params = dict(parse_qsl(exchange['params'], keep_blank_values=True))
+        start = time.perf_counter()
+        if exchange['method'] == 'POST' and '/reportData/' in exchange['endpoint']:
+            # reports are streamed by the services, read them the same way
+            response = rest.stream(http_method='POST', endpoint=exchange['endpoint'],
+                                   params=params)
+            for _ in response.iter_content(chunk_size=1024 * 1024):
+                pass
+            response.close()
+        else:
+            getattr(rest, exchange['method'].lower())(endpoint=exchange['endpoint'],
+                                                      params=params)
+        return time.perf_counter() - start
+
+    if workers == 1:
+        return [send(exchange) for exchange in exchanges]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(send, exchanges))
+
+
+def main(argv: [str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('recording', help='recording written by services.recording.record')
+    parser.add_argument('--time-scale', type=float, default=0,
+                        help='multiplier of the recorded server time, 0 to measure only the client')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='requests sent at once')
+    args = parser.parse_args(argv)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    latencies = replay_requests(args.recording, args.time_scale, args.workers)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    tracemalloc.start()
+    try:
+        replay_requests(args.recording, 0, args.workers)
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+    latencies.sort()
+    print(f'requests         {len(latencies):>10,}')
+    print(f'wall seconds     {wall:>10.3f}')
+    print(f'client cpu       {cpu:>10.3f} s')
+    print(f'peak memory      {peak:>10.1f} MB')
+    if latencies:
+        print(f'latency median   {statistics.median(latencies) * 1000:>10.2f} ms')
+        print(f'latency p95      {latencies[int(len(latencies) * 0.95)] * 1000:>10.2f} ms')
+        print(f'latency max      {latencies[-1] * 1000:>10.2f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""Benchmark suite of the services against the local mock Cognos server
+Measures throughput and peak Python memory of listing, crawling,
+bulk membership changes and large report parsing.
+The mock server runs in its own process so it does not share the CPU time
+and memory measurements of the client.
+run from the repository root:
+    python -m benchmarks.bench_suite [--scale 2] [--latency 0.005] [--save results.json]
+    python -m benchmarks.bench_suite --compare results.json
+the comparison fails (exit code 1) when a benchmark got slower or bigger than the tolerance
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from benchmarks.mock_server import MockCognosServer
+from objects.report_job import ReportJob
+from services.cognos_analytics import CognosAnalyticsService
+from services.report_scheduler import ReportScheduler
+
+
+def _serve(queue: multiprocessing.Queue, kwargs: dict):
+    server = MockCognosServer(**kwargs)
+    queue.put(server.url)
+    server.serve_forever()
+
+
+def start_server_process(**kwargs) -> tuple:
+    """ start a MockCognosServer in a child process, returns (process, url)"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(queue, kwargs), daemon=True)
+    process.start()
+    return process, queue.get(timeout=60)
+
+
+def list_users(ca_service: CognosAnalyticsService) -> int:
+    """all users with one request"""
+    return len(ca_service.users.get_users())
+
+
+def list_users_paged(ca_service: CognosAnalyticsService) -> int:
+    """all users, 500 per request"""
+    return sum(1 for _ in ca_service.users.iter_users(page_size=500))
+
+
+def crawl_content(ca_service: CognosAnalyticsService) -> int:
+    """the whole team folders tree"""
+    return sum(1 for _ in ca_service.content.walk(content_id='team_folders'))
+
+
+def crawl_content_policies(ca_service: CognosAnalyticsService) -> int:
+    """the reports of the team folders tree with their policies"""
+    return sum(1 for _ in ca_service.content.walk(content_id='team_folders',
+                                                  content_types=['report'],
+                                                  fetch_policies=True))
+
+
+def namespace_snapshot(ca_service: CognosAnalyticsService) -> int:
+    """the whole namespace"""
+    namespace = ca_service.namespaces.get_list_of_namespaces()[0]
+    return len(ca_service.namespaces.get_namespace_snapshot(namespace))
+
+
+def membership_changes(ca_service: CognosAnalyticsService, members: int = 10) -> int:
+    """add members to every group, then remove them one by one, 8 requests at once"""
+    groups = ca_service.groups.get_child_groups()
+    users = ca_service.users.get_users()[-members:]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda grp: ca_service.groups.add_group_members(grp, users_to_add=users),
+                      groups))
+        list(pool.map(lambda pair: ca_service.groups.remove_group_member(*pair),
+                      [(grp, usr) for grp in groups for usr in users]))
+    return len(groups) * (members + 1)
+
+
+def report_sync(ca_service: CognosAnalyticsService) -> int:
+    """the report parsed in one go"""
+    data = ca_service.report_data.run_report_sync(reportid='report')
+    return len(data['dataSet']['dataTable'][0]['row'])
+
+
+def report_stream(ca_service: CognosAnalyticsService) -> int:
+    """the report parsed as it streams in"""
+    return sum(len(batch) for batch in
+               ca_service.report_data.run_report_stream(reportid='report', batch_size=10000))
+
+
+def report_async(ca_service: CognosAnalyticsService, reports: int = 4) -> int:
+    """reports submitted and polled by the ReportScheduler, 2 at once"""
+    scheduler = ReportScheduler({'disp': ca_service.report_data}, max_per_dispatcher=2,
+                                poll_interval=0.01)
+    jobs = scheduler.run(ReportJob(priority=0, reportid='report', prompts={'Region': i})
+                         for i in range(reports))
+    return sum(len(job.result['dataSet']['dataTable'][0]['row']) for job in jobs)
+
+
+BENCHMARKS: Dict[str, Callable[[CognosAnalyticsService], int]] = {
+    'list_users': list_users,
+    'list_users_paged': list_users_paged,
+    'crawl_content': crawl_content,
+    'crawl_content_policies': crawl_content_policies,
+    'namespace_snapshot': namespace_snapshot,
+    'membership_changes': membership_changes,
+    'report_sync': report_sync,
+    'report_stream': report_stream,
+    'report_async': report_async,
+}
+
+
+def measure(name: str, url: str, memory: bool = True) -> dict:
+    """ time one benchmark on a fresh session, then run it again under tracemalloc"""
+    func = BENCHMARKS[name]
+    ca_service = CognosAnalyticsService(ca_url=url, pool_maxsize=16)
+    ca_service.login(namespace='LDAP', user='admin', password='secret')
+    start = time.perf_counter()
+    items = func(ca_service)
+    elapsed = time.perf_counter() - start
+    result = {'items': items, 'seconds': elapsed, 'items_per_second': items / elapsed}
+    if memory:
+        tracemalloc.start()
+        try:
+            func(ca_service)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """ benchmarks slower or bigger than the baseline by more than the tolerance"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['items_per_second'] < before['items_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['items_per_second']:,.0f} items/s, "
+                               f"was {before['items_per_second']:,.0f}")
+        if 'peak_mb' in result and 'peak_mb' in before and \
+                result['peak_mb'] > before['peak_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['peak_mb']:.1f} MB peak, "
+                               f"was {before['peak_mb']:.1f}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--scale', type=float, default=1,
+                        help='multiplier of the generated data sizes')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the server waits before every response')
+    parser.add_argument('--description-size', type=int, default=0,
+                        help='characters of filler in every object, to grow the payloads')
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS),
+                        help='benchmarks to run, all by default')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the tracemalloc runs')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed slowdown or memory growth when comparing')
+    args = parser.parse_args(argv)
+
+    scale = args.scale
+    process, url = start_server_process(users=int(10000 * scale),
+                                        groups=int(300 * scale),
+                                        roles=int(50 * scale),
+                                        folder_fanout=max(1, int(6 * scale)),
+                                        report_rows=int(200000 * scale),
+                                        description_size=args.description_size,
+                                        latency=args.latency)
+    results = {}
+    try:
+        print(f'{"benchmark":<24} {"items":>9} {"seconds":>9} {"items/s":>12} {"peak MB":>9}')
+        for name in args.only or BENCHMARKS:
+            result = results[name] = measure(name, url, memory=not args.no_memory)
+            peak = f"{result['peak_mb']:>9.1f}" if 'peak_mb' in result else f'{"-":>9}'
+            print(f"{name:<24} {result['items']:>9,} {result['seconds']:>9.3f} "
+                  f"{result['items_per_second']:>12,.0f} {peak}")
+    finally:
+        process.terminate()
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
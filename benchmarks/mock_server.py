@@ -0,0 +1,509 @@
+"""Local stand-in for a Cognos Analytics server, for benchmarks without a live server
+Emulates the endpoints used by the services: session login, users, groups, roles,
+content, namespaces and rds reportData, with generated data of configurable size
+and a configurable latency per request.
+usage:
+    with MockCognosServer(users=10000, latency=0.01) as server:
+        ca_service = CognosAnalyticsService(ca_url=server.url)
+        ca_service.login(namespace='LDAP', user='admin', password='secret')
+run on its own to try the library against it interactively:
+    python -m benchmarks.mock_server [port]
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+class MockCognosData:
+    """ Generated users, groups, roles, content tree and namespace tree"""
+
+    def __init__(self,
+                 users: int = 1000,
+                 groups: int = 200,
+                 roles: int = 50,
+                 members_per_group: int = 50,
+                 folder_depth: int = 3,
+                 folder_fanout: int = 5,
+                 reports_per_folder: int = 10,
+                 description_size: int = 0,
+                 seed: int = 0):
+        """
+        :param users: number of users
+        :param groups: number of groups, also used for the namespace folders
+        :param roles: number of roles
+        :param members_per_group: users in every group and role
+        :param folder_depth: levels of folders under team_folders
+        :param folder_fanout: sub folders in every folder
+        :param reports_per_folder: reports in every folder
+        :param description_size: characters of filler in every defaultDescription,
+            to grow the payloads
+        :param seed: random seed of the memberships
+        """
+        rnd = random.Random(seed)
+        filler = 'x' * description_size
+        self.lock = threading.Lock()
+        self.users: Dict[str, dict] = {}
+        self.identities = set()
+        self._user_count = 0
+        for i in range(users):
+            self.add_user('LDAP', f'uid=user{i}', f'User {i}')
+        self.groups: Dict[str, dict] = {
+            f'g{i}': {'id': f'g{i}', 'type': 'group', 'defaultName': f'Group {i}',
+                      'searchPath': f'CAMID("LDAP:g:{i}")', 'defaultDescription': filler,
+                      'modificationTime': '2024-01-01T00:00:00.000Z', 'version': 1}
+            for i in range(groups)}
+        self.roles: Dict[str, dict] = {
+            f'r{i}': {'id': f'r{i}', 'type': 'role', 'defaultName': f'Role {i}',
+                      'searchPath': f'CAMID("::r:{i}")', 'defaultDescription': filler,
+                      'modificationTime': '2024-01-01T00:00:00.000Z', 'version': 1}
+            for i in range(roles)}
+        user_ids = list(self.users)
+        self.members: Dict[str, Dict[str, set]] = {}
+        for container_id in list(self.groups) + list(self.roles):
+            self.members[container_id] = {
+                'users': set(rnd.sample(user_ids, min(members_per_group, len(user_ids)))),
+                'groups': set()}
+        self.content: Dict[str, dict] = {}
+        self.items: Dict[str, List[str]] = {}
+        self._add_folder('team_folders', 'teamFolders', 'Team Content', folder_depth,
+                         folder_fanout, reports_per_folder, filler)
+        self.namespace_items: Dict[str, List[dict]] = {}
+        self._add_namespace(filler)
+        self.report_rows = 100000
+        self.report_polls = 1
+        # asynchronous report runs by conversation id: [rows, polls left before the output is ready]
+        self.conversations: Dict[str, list] = {}
+        self.report_waits = 0
+        # prompt values (p_<parameter name>) of every report run
+        self.report_prompts: List[Dict[str, str]] = []
+        self.profile_failures = 0.0
+
+    def add_user(self, namespace: str, identity: str, default_name: str) -> Optional[dict]:
+        """ add a user, None if the identity already exists"""
+        with self.lock:
+            if identity in self.identities:
+                return None
+            self.identities.add(identity)
+            user_id = f'u{self._user_count}'
+            self._user_count += 1
+            user = {'id': user_id, 'type': 'account', 'defaultName': default_name,
+                    'identity': identity, 'searchPath': f'CAMID("{namespace}:u:{identity}")',
+                    'userName': identity, 'email': f'{user_id}@example.com',
+                    'modificationTime': '2024-01-01T00:00:00.000Z', 'version': 1}
+            self.users[user_id] = user
+            return user
+
+    def _add_folder(self, folder_id: str, folder_type: str, name: str, depth: int,
+                    fanout: int, reports: int, filler: str):
+        self.content[folder_id] = {'id': folder_id, 'type': folder_type, 'defaultName': name,
+                                   'modificationTime': '2024-01-01T00:00:00.000Z',
+                                   'defaultDescription': filler,
+                                   'policies': [_policy('CAMID("::Everyone")',
+                                                        ('read', 'traverse'))]}
+        children = []
+        for i in range(reports):
+            report_id = f'{folder_id}_r{i}'
+            self.content[report_id] = {
+                'id': report_id, 'type': 'report', 'defaultName': f'{name} report {i}',
+                'modificationTime': '2024-01-01T00:00:00.000Z', 'defaultDescription': filler,
+                'policies': [_policy('CAMID("::Everyone")', ('read', 'execute', 'traverse')),
+                             _policy(f'CAMID("LDAP:g:{i}")', ('read', 'write'))]}
+            children.append(report_id)
+        if depth > 0:
+            for i in range(fanout):
+                sub_id = f'{folder_id}_f{i}'
+                self._add_folder(sub_id, 'folder', f'{name} / Folder {i}', depth - 1,
+                                 fanout, reports, filler)
+                children.append(sub_id)
+        self.items[folder_id] = children
+
+    def _add_namespace(self, filler: str):
+        """ namespace LDAP with a folder per ten groups, holding groups, roles and users"""
+        self.namespace_items['LDAP'] = []
+        folders = max(1, len(self.groups) // 10)
+        for i in range(folders):
+            self.namespace_items['LDAP'].append(_namespace_object(
+                f'nf{i}', 'folder', f'Folder {i}', True, filler))
+            self.namespace_items[f'nf{i}'] = []
+        for i, obj in enumerate(list(self.groups.values()) + list(self.roles.values())):
+            self.namespace_items[f'nf{i % folders}'].append(_namespace_object(
+                obj['id'], obj['type'], obj['defaultName'], False, filler))
+        for i, user in enumerate(self.users.values()):
+            self.namespace_items[f'nf{i % folders}'].append(_namespace_object(
+                user['id'], 'account', user['defaultName'], False, filler))
+
+    def container(self, kind: str, container_id: str) -> Optional[dict]:
+        """ group or role by id"""
+        return (self.groups if kind == 'groups' else self.roles).get(container_id)
+
+    def member_listing(self, container_id: str) -> dict:
+        """ members response of a group or role"""
+        with self.lock:
+            members = self.members.get(container_id, {'users': set(), 'groups': set()})
+            return {'users': [self.users[user_id] for user_id in sorted(members['users'])
+                              if user_id in self.users],
+                    'groups': [self.groups[group_id] for group_id in sorted(members['groups'])
+                               if group_id in self.groups]}
+
+
+def _policy(search_path: str, permissions) -> dict:
+    return {'securityObject': {'searchPath': search_path, 'type': 'group'},
+            'permissions': [{'name': name, 'access': 'grant'} for name in permissions]}
+
+
+def _namespace_object(object_id: str, object_class: str, name: str, has_children: bool,
+                      filler: str) -> dict:
+    return {'id': object_id, 'type': object_class, 'defaultName': name,
+            'searchPath': f'CAMID("LDAP:{object_class[0]}:{object_id}")',
+            'objectClass': object_class, 'hasChildren': has_children,
+            'defaultDescription': filler, 'modificationTime': '2024-01-01T00:00:00.000Z'}
+
+
+def report_rows(count: int) -> Iterator[dict]:
+    """ rows of the generated list report"""
+    for i in range(count):
+        yield {'Region': f'Region {i % 20}', 'Product line': f'Line {i % 7}',
+               'Order date': f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+               'Quantity': i % 1000, 'Revenue': round(i * 1.37, 2)}
+
+
+def _page(items: list, query: dict) -> list:
+    """ offset / limit paging"""
+    if 'limit' not in query:
+        return items
+    offset = int(query.get('offset', 0))
+    return items[offset:offset + int(query['limit'])]
+
+
+class MockCognosHandler(BaseHTTPRequestHandler):
+    """ Routes the requests to the MockCognosData of the server"""
+    protocol_version = 'HTTP/1.1'
+    server: 'MockCognosServer'
+
+    routes = []
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """quiet, the benchmarks would measure the logging otherwise"""
+
+    def _send_json(self, status: int, data=None, headers: Dict[str, str] = None):
+        body = b'' if data is None else json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        if data is not None:
+            self.send_header('Content-Type', 'application/json')
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(self, chunks: Iterator[bytes]):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f'{len(chunk):x}\r\n'.encode('ascii') + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _handle(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        data = json.loads(body) if body and \
+            self.headers.get('Content-Type', '').startswith('application/json') else None
+        self.server.wait()
+        with self.server.stats_lock:
+            self.server.requests += 1
+        for method, pattern, handler in self.routes:
+            if method != self.command:
+                continue
+            match = pattern.fullmatch(url.path)
+            if match is not None:
+                handler(self, query, data, *match.groups())
+                return
+        self._send_json(404, {'message': f'{self.command} {url.path} is not emulated'})
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    # session
+    def put_session(self, query, data):
+        self._send_json(201, {'session_key': f'CAM mock{self.server.requests}'})
+
+    def delete_session(self, query, data):
+        self._send_json(204)
+
+    def post_logon(self, query, data):
+        self._send_json(200, {}, headers={'Set-Cookie': 'XSRF-TOKEN=mock-xsrf; Path=/'})
+
+    # users
+    def get_users(self, query, data):
+        users = list(self.server.data.users.values())
+        if query.get('identifier'):
+            users = [user for user in users if user['identity'] == query['identifier']]
+        self._send_json(200, {'users': _page(users, query)})
+
+    def post_user(self, query, data):
+        user = self.server.data.add_user(query.get('namespace', ''),
+                                         data['identity'], data['defaultName'])
+        if user is None:
+            self._send_json(409, {'message': 'already exists'})
+        else:
+            self._send_json(201, user)
+
+    def delete_user(self, query, data, user_id):
+        with self.server.data.lock:
+            found = self.server.data.users.pop(user_id, None)
+            if found:
+                self.server.data.identities.discard(found['identity'])
+        self._send_json(204 if found else 404)
+
+    def copy_profile(self, query, data, user_id):
+        targets = data.get('targetUsers', [])
+        failure_rate = self.server.data.profile_failures
+        failed = [target for target in targets if random.random() < failure_rate]
+        failed_ids = set(failed)
+        succeeded = [target for target in targets if target not in failed_ids]
+        self._send_json(200, {'failed': len(failed), 'failedList': failed,
+                              'succes': len(succeeded), 'succesList': succeeded})
+
+    # groups and roles
+    def list_containers(self, query, data, kind):
+        containers = list((self.server.data.groups if kind == 'groups'
+                           else self.server.data.roles).values())
+        self._send_json(200, {kind: _page(containers, query)})
+
+    def get_container(self, query, data, kind, container_id):
+        container = self.server.data.container(kind, container_id)
+        if container is None:
+            self._send_json(404, {'message': 'not found'})
+        else:
+            self._send_json(200, container)
+
+    def create_container(self, query, data, kind, parent_id):
+        containers = self.server.data.groups if kind == 'groups' else self.server.data.roles
+        with self.server.data.lock:
+            container_id = f'{kind[0]}{len(containers)}'
+            containers[container_id] = {'id': container_id, 'type': data.get('type', kind[:-1]),
+                                        'defaultName': data['defaultName'],
+                                        'searchPath': f'CAMID("LDAP:{kind[0]}:{container_id}")'}
+            self.server.data.members[container_id] = {'users': set(), 'groups': set()}
+        self._send_json(201, containers[container_id])
+
+    def delete_container(self, query, data, kind, container_id):
+        containers = self.server.data.groups if kind == 'groups' else self.server.data.roles
+        with self.server.data.lock:
+            found = containers.pop(container_id, None)
+        self._send_json(204 if found else 404)
+
+    def get_members(self, query, data, kind, container_id):
+        if self.server.data.container(kind, container_id) is None:
+            self._send_json(404, {'message': 'not found'})
+            return
+        self._send_json(200, self.server.data.member_listing(container_id))
+
+    def add_members(self, query, data, kind, container_id):
+        with self.server.data.lock:
+            members = self.server.data.members.setdefault(container_id,
+                                                          {'users': set(), 'groups': set()})
+            for member_kind in ('users', 'groups'):
+                members[member_kind].update(member['id'] for member in data.get(member_kind, []))
+        self._send_json(200, {})
+
+    def remove_member(self, query, data, kind, container_id, member_type, member_id):
+        with self.server.data.lock:
+            members = self.server.data.members.get(container_id)
+            member_kind = 'users' if member_type == 'user' else 'groups'
+            found = members is not None and member_id in members[member_kind]
+            if found:
+                members[member_kind].discard(member_id)
+        self._send_json(204 if found else 404)
+
+    # content
+    def get_content(self, query, data, content_id):
+        obj = self.server.data.content.get(content_id)
+        if obj is None:
+            self._send_json(404, {'message': 'not found'})
+            return
+        if query.get('fields'):
+            names = set(query['fields'].split(',')) | {'id', 'type'}
+            obj = {key: value for key, value in obj.items() if key in names}
+        self._send_json(200, obj)
+
+    def get_content_items(self, query, data, content_id):
+        content = self.server.data.content
+        items = [{key: value for key, value in content[item_id].items() if key != 'policies'}
+                 for item_id in self.server.data.items.get(content_id, [])]
+        self._send_json(200, {'content': _page(items, query)})
+
+    def put_content(self, query, data, content_id):
+        with self.server.data.lock:
+            obj = self.server.data.content.get(content_id)
+            if obj is not None:
+                obj.update(data)
+        self._send_json(204 if obj is not None else 404)
+
+    # namespaces
+    def get_namespaces(self, query, data):
+        self._send_json(200, {'data': [_namespace_object('LDAP', 'namespace', 'LDAP', True,
+                                                         '')]})
+
+    def get_namespace_items(self, query, data, object_id):
+        self._send_json(200, {'data': _page(self.server.data.namespace_items.get(object_id, []),
+                                            query)})
+
+    # reports
+    def post_report(self, query, data, report_id):
+        rows = self.server.data.report_rows
+        if query.get('row_limit'):
+            rows = min(rows, int(query['row_limit']))
+        with self.server.data.lock:
+            self.server.data.report_prompts.append(
+                {key: value for key, value in query.items() if key.startswith('p_')})
+            if query.get('async') == 'MANUAL':
+                conversation_id = f'conv{len(self.server.data.report_prompts)}'
+                self.server.data.conversations[conversation_id] = \
+                    [rows, self.server.data.report_polls]
+        if query.get('async') == 'MANUAL':
+            self._send_json(202, {'conversationID': conversation_id})
+        else:
+            self._send_chunked(self._report_chunks(rows))
+
+    def wait_report(self, query, data, conversation_id):
+        """ 202 while polls are left, then the output of the report"""
+        with self.server.data.lock:
+            self.server.data.report_waits += 1
+            conversation = self.server.data.conversations.get(conversation_id)
+            ready = conversation is not None and conversation[1] <= 0
+            if ready:
+                del self.server.data.conversations[conversation_id]
+            elif conversation is not None:
+                conversation[1] -= 1
+        if conversation is None:
+            self._send_json(404, {'message': 'not found'})
+        elif ready:
+            self._send_chunked(self._report_chunks(conversation[0]))
+        else:
+            self._send_json(202, {'conversationID': conversation_id})
+
+    def _report_chunks(self, rows: int, rows_per_chunk: int = 1000) -> Iterator[bytes]:
+        yield b'{"dataSet": {"dataTable": [{"id": "List1", "row": ['
+        batch = []
+        for i, row in enumerate(report_rows(rows)):
+            batch.append(json.dumps(row))
+            if len(batch) == rows_per_chunk:
+                yield (',' if i >= rows_per_chunk else '').encode('ascii') + \
+                    ','.join(batch).encode('utf-8')
+                batch = []
+        if batch:
+            yield (',' if rows > len(batch) else '').encode('ascii') + \
+                ','.join(batch).encode('utf-8')
+        yield b']}]}}'
+
+
+
+def _route(method: str, path: str, handler):
+    MockCognosHandler.routes.append((method, re.compile(path), handler))
+
+
+_route('PUT', r'/api/v1/session', MockCognosHandler.put_session)
+_route('DELETE', r'/api/v1/session', MockCognosHandler.delete_session)
+_route('POST', r'/v1/disp/rds/auth/logon', MockCognosHandler.post_logon)
+_route('GET', r'/api/v1/users', MockCognosHandler.get_users)
+_route('POST', r'/api/v1/users', MockCognosHandler.post_user)
+_route('DELETE', r'/api/v1/users/([^/]+)', MockCognosHandler.delete_user)
+_route('POST', r'/api/v1/users/([^/]+)/copy_profile', MockCognosHandler.copy_profile)
+_route('GET', r'/api/v1/(groups|roles)', MockCognosHandler.list_containers)
+_route('GET', r'/api/v1/(groups|roles)/([^/]+)', MockCognosHandler.get_container)
+_route('POST', r'/api/v1/(groups|roles)/([^/]+)', MockCognosHandler.create_container)
+_route('DELETE', r'/api/v1/(groups|roles)/([^/]+)', MockCognosHandler.delete_container)
+_route('GET', r'/api/v1/(groups|roles)/([^/]+)/members', MockCognosHandler.get_members)
+_route('POST', r'/api/v1/(groups|roles)/([^/]+)/members', MockCognosHandler.add_members)
+_route('DELETE', r'/api/v1/(groups|roles)/([^/]+)/members/(user|group)/([^/]+)',
+       MockCognosHandler.remove_member)
+_route('GET', r'/api/v1/content/([^/]+)', MockCognosHandler.get_content)
+_route('GET', r'/api/v1/content/([^/]+)/items', MockCognosHandler.get_content_items)
+_route('PUT', r'/api/v1/content/([^/]+)', MockCognosHandler.put_content)
+_route('GET', r'/v1/namespaces', MockCognosHandler.get_namespaces)
+_route('GET', r'/v1/namespaces/([^/]+)/items', MockCognosHandler.get_namespace_items)
+_route('POST', r'/v1/disp/rds/reportData/report/([^/]+)', MockCognosHandler.post_report)
+_route('GET', r'/v1/disp/rds/wait/conversationID/([^/]+)', MockCognosHandler.wait_report)
+
+
+class MockCognosServer(ThreadingHTTPServer):
+    """ Threaded HTTP server answering like Cognos Analytics, on a free local port by default"""
+    daemon_threads = True
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 report_rows: int = 100000,
+                 report_polls: int = 1,
+                 profile_failures: float = 0.0,
+                 **kwargs):
+        """
+        :param latency: seconds every request waits before it is answered
+        :param jitter: random extra seconds, up to this many, added to the latency
+        :param report_rows: rows returned by every report
+        :param report_polls: polls of an asynchronous report answered with 202 before its output
+        :param profile_failures: share of copy_profile targets reported as failed
+        :param kwargs: MockCognosData arguments, e.g. users or folder_depth
+        """
+        super().__init__((host, port), MockCognosHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.data = MockCognosData(**kwargs)
+        self.data.report_rows = report_rows
+        self.data.report_polls = report_polls
+        self.data.profile_failures = profile_failures
+        self.requests = 0
+        self.stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """ca_url of the server"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def wait(self):
+        """the emulated server side latency"""
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    def start(self) -> 'MockCognosServer':
+        """serve on a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name='mock_cognos',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """stop serving and close the socket"""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'MockCognosServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    server = MockCognosServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 9300)
+    print(f'Mock Cognos Analytics server on {server.url}, Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -1,2 +1,6 @@
 class RestServiceException(Exception):
-    pass
\ No newline at end of file
+    """raised when a REST call fails, status_code is None if no response was received"""
+
+    def __init__(self, message: str = '', status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
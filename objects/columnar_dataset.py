@@ -0,0 +1,66 @@
+"""Columnar report output"""
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass
+class ColumnarDataSet:
+    """
+    store report output as typed NumPy arrays, one per column
+    string columns are dictionary encoded: the column holds int32 codes
+    (-1 for empty values) and dictionaries holds the distinct values,
+    bool columns with empty values have a mask, True where the value is empty
+    """
+    columns: Dict[str, Any] = field(default_factory=dict)
+    dictionaries: Dict[str, Any] = field(default_factory=dict)
+    masks: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def num_rows(self) -> int:
+        """number of rows"""
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def decode(self, name: str):
+        """ column values, with dictionary encoded strings and masked bools
+        decoded to an object array, None for empty values
+        """
+        import numpy as np
+        column = self.columns[name]
+        if name in self.masks:
+            values = column.astype(object)
+            values[self.masks[name]] = None
+            return values
+        if name not in self.dictionaries:
+            return column
+        values = np.append(self.dictionaries[name], None)
+        # code -1 picks up the trailing None
+        return values[column]
+
+    def to_arrow(self):
+        """convert to pyarrow Table, string columns become DictionaryArrays"""
+        import pyarrow as pa
+        arrays = {}
+        for name, column in self.columns.items():
+            if name in self.dictionaries:
+                arrays[name] = pa.DictionaryArray.from_arrays(
+                    pa.array(column, mask=column < 0),
+                    pa.array(self.dictionaries[name], type=pa.string()))
+            else:
+                arrays[name] = pa.array(column, mask=self.masks.get(name))
+        return pa.table(arrays)
+
+    def to_pandas(self):
+        """ convert to pandas DataFrame, string columns become Categoricals
+        and bool columns with empty values nullable booleans
+        """
+        import pandas as pd
+        frame = {}
+        for name, column in self.columns.items():
+            if name in self.dictionaries:
+                frame[name] = pd.Categorical.from_codes(column,
+                                                        categories=self.dictionaries[name])
+            elif name in self.masks:
+                frame[name] = pd.arrays.BooleanArray(column, self.masks[name])
+            else:
+                frame[name] = column
+        return pd.DataFrame(frame)
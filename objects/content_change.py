@@ -0,0 +1,13 @@
+"""Change of a content object found by the incremental content sync"""
+from dataclasses import dataclass
+from objects.content_object import ContentObject
+
+
+@dataclass
+class ContentChange:
+    """
+    store a change of a content object: added, changed or deleted
+    """
+    event: str
+    content_object: ContentObject
+    parent_id: str
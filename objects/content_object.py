@@ -4,8 +4,10 @@ from typing import Optional,List
 from objects.object import Object
 from objects.policy import Policy
 
-@dataclass
+@dataclass(slots=True)
 class ContentObject(Object):
     """store information about a content object"""
+    nested = {'policies': (Policy, True)}
+
     policies: [Policy] = None
     modificationTime: Optional[str] = None
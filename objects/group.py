@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Optional
 from objects.object import Object
 
-@dataclass
+@dataclass(slots=True)
 class Group(Object):
     """
     store information about a CA Group
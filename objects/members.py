@@ -1,11 +1,14 @@
 from dataclasses import dataclass
+from objects.model import Model
 from objects.user import User
 from objects.group import Group
 
-@dataclass
-class Members:
+@dataclass(slots=True)
+class Members(Model):
     """
     store information group or role members
     """
+    nested = {'users': (User, True), 'groups': (Group, True)}
+
     users: [User]
     groups: [Group]    
\ No newline at end of file
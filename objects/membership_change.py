@@ -0,0 +1,25 @@
+"""Membership change of a group or role computed by the MembershipReconciler"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+from objects.object import Object
+
+
+@dataclass
+class MembershipChange:
+    """
+    store the members to add to and remove from a group or role, and the outcome:
+    unchanged, planned (dry run), applied or failed
+    """
+    container: Object
+    users_to_add: List[Object] = field(default_factory=list)
+    groups_to_add: List[Object] = field(default_factory=list)
+    users_to_remove: List[Object] = field(default_factory=list)
+    groups_to_remove: List[Object] = field(default_factory=list)
+    status: str = 'unchanged'
+    failed_writes: int = 0
+    error: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        """True if the members are already the desired ones"""
+        return not (self.users_to_add or self.groups_to_add
+                    or self.users_to_remove or self.groups_to_remove)
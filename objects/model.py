@@ -0,0 +1,133 @@
+"""Base for the Cognos Analytics dataclasses
+from_dict / to_dict functions are generated once per class from its fields,
+so building objects from REST listings does no per-item field lookups
+"""
+import threading
+from dataclasses import fields, MISSING
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+_FIELD_NAMES: Dict[type, frozenset] = {}
+_FROM_DICT: Dict[type, Callable] = {}
+_TO_DICT: Dict[type, Callable] = {}
+# called with (class, seconds) after every from_dict when set, see Instrumentation
+_from_dict_hook: Optional[Callable[[type, float], None]] = None
+_hook_lock = threading.Lock()
+
+
+def set_from_dict_hook(hook: Optional[Callable[[type, float], None]]):
+    """ time every from_dict with the hook, None stops timing"""
+    global _from_dict_hook  # pylint: disable=global-statement
+    with _hook_lock:
+        _from_dict_hook = hook
+
+
+def remove_from_dict_hook(hook: Callable[[type, float], None]) -> bool:
+    """ stop timing from_dict, only if hook is still the one set"""
+    global _from_dict_hook  # pylint: disable=global-statement
+    with _hook_lock:
+        if _from_dict_hook != hook:
+            return False
+        _from_dict_hook = None
+        return True
+
+
+def get_attribute(obj, name: str):
+    """attribute of a dataclass or key of the dict returned by the REST API"""
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+
+def _load_one(from_dict: Callable, value):
+    """nested object from dict, anything else is kept as is"""
+    return from_dict(value) if isinstance(value, dict) else value
+
+
+def _load_list(from_dict: Callable, values):
+    """nested objects from list of dicts"""
+    if values is None:
+        return None
+    return [from_dict(value) if isinstance(value, dict) else value for value in values]
+
+
+def _dump(value):
+    """nested object(s) to dict(s)"""
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [item.to_dict() if isinstance(item, Model) else item for item in value]
+    return value
+
+
+def _build_from_dict(cls) -> Callable:
+    env = {'cls': cls, '_load_one': _load_one, '_load_list': _load_list}
+    arguments = []
+    for field in fields(cls):
+        name = field.name
+        if field.default is not MISSING:
+            env[f'_default_{name}'] = field.default
+            value = f'data.get({name!r}, _default_{name})'
+        elif field.default_factory is not MISSING:
+            env[f'_factory_{name}'] = field.default_factory
+            value = f'data[{name!r}] if {name!r} in data else _factory_{name}()'
+        else:
+            value = f'data[{name!r}]'
+        if name in cls.nested:
+            nested_cls, is_list = cls.nested[name]
+            env[f'_nested_{name}'] = nested_cls.from_dict
+            value = f"{'_load_list' if is_list else '_load_one'}(_nested_{name}, {value})"
+        arguments.append(f'{name}={value}')
+    source = f"def from_dict(data):\n    return cls({', '.join(arguments)})\n"
+    exec(source, env)  # pylint: disable=exec-used
+    return env['from_dict']
+
+
+def _build_to_dict(cls) -> Callable:
+    env = {'_dump': _dump}
+    items = []
+    for field in fields(cls):
+        name = field.name
+        value = f'_dump(self.{name})' if name in cls.nested else f'self.{name}'
+        items.append(f'{name!r}: {value}')
+    source = f"def to_dict(self):\n    return {{{', '.join(items)}}}\n"
+    exec(source, env)  # pylint: disable=exec-used
+    return env['to_dict']
+
+
+class Model:
+    """
+    Base for the dataclasses: cached field names and fast from_dict / to_dict
+    """
+    __slots__ = ()
+    # field name -> (Model subclass, is list) for nested objects
+    nested = {}
+
+    @classmethod
+    def field_names(cls) -> frozenset:
+        """names of the dataclass fields"""
+        names = _FIELD_NAMES.get(cls)
+        if names is None:
+            names = _FIELD_NAMES[cls] = frozenset(field.name for field in fields(cls))
+        return names
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """ build from a dict returned by the REST API, keys that are not fields are ignored
+        and nested objects are built from their dicts
+        """
+        from_dict = _FROM_DICT.get(cls)
+        if from_dict is None:
+            from_dict = _FROM_DICT[cls] = _build_from_dict(cls)
+        hook = _from_dict_hook
+        if hook is None:
+            return from_dict(data)
+        start = perf_counter()
+        obj = from_dict(data)
+        hook(cls, perf_counter() - start)
+        return obj
+
+    def to_dict(self) -> dict:
+        """ convert to dict, including nested objects"""
+        to_dict = _TO_DICT.get(type(self))
+        if to_dict is None:
+            to_dict = _TO_DICT[type(self)] = _build_to_dict(type(self))
+        return to_dict(self)
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Optional
 from objects.object import Object
 
-@dataclass
+@dataclass(slots=True)
 class NamespaceObject(Object):
     """store information about a Namespace object"""
     searchPath: str
@@ -0,0 +1,49 @@
+"""Snapshot of a whole namespace tree"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from objects.namespace_object import NamespaceObject
+
+
+@dataclass
+class NamespaceSnapshot:
+    """
+    store all objects of a namespace keyed by id,
+    with lookups by searchPath and parent id,
+    and the objects whose children could not be read
+    """
+    root_id: str
+    objects: Dict[str, NamespaceObject] = field(default_factory=dict)
+    search_paths: Dict[str, str] = field(default_factory=dict)
+    children: Dict[str, List[str]] = field(default_factory=dict)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """True if the children of every object were read"""
+        return not self.failed
+
+    def add(self, parent_id: str, obj: NamespaceObject):
+        """add an object under the parent"""
+        self.objects[obj.id] = obj
+        self.search_paths[obj.searchPath] = obj.id
+        self.children.setdefault(parent_id, []).append(obj.id)
+
+    def get(self, object_id: str) -> Optional[NamespaceObject]:
+        """object by id"""
+        return self.objects.get(object_id)
+
+    def get_by_search_path(self, search_path: str) -> Optional[NamespaceObject]:
+        """object by searchPath"""
+        object_id = self.search_paths.get(search_path)
+        return None if object_id is None else self.objects[object_id]
+
+    def get_children(self, object_id: str) -> List[NamespaceObject]:
+        """direct children of the object"""
+        return [self.objects[child_id] for child_id in self.children.get(object_id, [])]
+
+    def of_class(self, object_class: str) -> List[NamespaceObject]:
+        """all objects of objectClass, e.g. group, role, account, folder"""
+        return [obj for obj in self.objects.values() if obj.objectClass == object_class]
+
+    def __len__(self):
+        return len(self.objects)
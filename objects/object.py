@@ -1,9 +1,10 @@
 """Common attributes for every Cognos Analytics object"""
 from dataclasses import dataclass
+from objects.model import Model
 
 
-@dataclass
-class Object:
+@dataclass(slots=True)
+class Object(Model):
     """
     All attributes for every CA object
     """
@@ -1,8 +1,9 @@
 """Permissions object"""
 from dataclasses import dataclass
+from objects.model import Model
 
-@dataclass
-class Permission:
+@dataclass(slots=True)
+class Permission(Model):
     """
     All attributes for permissions
     """
@@ -1,18 +1,30 @@
 """Common attributes for Policies"""
 from dataclasses import dataclass
 import json
+from objects.model import Model, get_attribute
 from objects.permission import Permission
 from objects.security_object import SecurityObject
 
-@dataclass
-class Policy:
+
+@dataclass(slots=True)
+class Policy(Model):
     """
     All attributes for Policy
     """
+    nested = {'permissions': (Permission, True), 'securityObject': (SecurityObject, False)}
+
     permissions: [Permission]
     securityObject: SecurityObject
 
     def to_json(self):
         """convert to json"""
-        return json.dumps(self, default=lambda o: o.__dict__)
+        return json.dumps(self.to_dict())
+
+    def key(self) -> tuple:
+        """ comparable form of the policy: searchPath and the set of (permission, access),
+        permissions and securityObject can be dataclasses or dicts as returned by the REST API
+        """
+        return (get_attribute(self.securityObject, 'searchPath'),
+                frozenset((get_attribute(permission, 'name'), get_attribute(permission, 'access'))
+                          for permission in self.permissions))
     
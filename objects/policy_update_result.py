@@ -0,0 +1,14 @@
+"""Outcome of a bulk policy update for one content object"""
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class PolicyUpdateResult:
+    """
+    store the outcome of updating the policies of a content object:
+    unchanged, drifted (dry run), updated or failed
+    """
+    content_id: str
+    status: str
+    error: Optional[str] = None
@@ -0,0 +1,21 @@
+"""Outcome of a chunked user profile copy"""
+from dataclasses import dataclass, field, asdict
+from typing import List
+
+
+@dataclass
+class ProfileCopyReport:
+    """
+    store the target user ids the profile was copied to, the ones that still failed
+    after the retries, and the request counts and time it took
+    """
+    source_id: str
+    succeeded: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    requests: int = 0
+    rounds: int = 0
+    elapsed: float = 0.0
+
+    def to_dict(self) -> dict:
+        """machine readable form, e.g. for json.dumps"""
+        return asdict(self)
@@ -0,0 +1,40 @@
+"""Summary of a bulk user provisioning run"""
+from dataclasses import dataclass, field, asdict
+from typing import List
+from objects.user_provision_result import UserProvisionResult
+
+
+@dataclass
+class ProvisioningSummary:
+    """
+    store the counts, throughput and failed records of a bulk user provisioning run
+    """
+    total: int = 0
+    created: int = 0
+    exists: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+    failures: List[UserProvisionResult] = field(default_factory=list)
+
+    @property
+    def per_second(self) -> float:
+        """records processed per second"""
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def add(self, result: UserProvisionResult):
+        """count the outcome of one record"""
+        self.total += 1
+        # invalid records are not sent, 0 attempts
+        self.retries += max(0, result.attempts - 1)
+        if result.status == 'created':
+            self.created += 1
+        elif result.status == 'exists':
+            self.exists += 1
+        else:
+            self.failed += 1
+            self.failures.append(result)
+
+    def to_dict(self) -> dict:
+        """machine readable form, e.g. for json.dumps"""
+        return dict(asdict(self), per_second=self.per_second)
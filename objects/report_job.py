@@ -0,0 +1,22 @@
+"""Report run scheduled by the ReportScheduler"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass(order=True)
+class ReportJob:
+    """
+    store a report to run and its outcome,
+    jobs with a lower priority value run first
+    """
+    priority: int
+    reportid: str = field(compare=False)
+    report_object: str = field(default='', compare=False)
+    fmt: str = field(default='DataSetJSON', compare=False)
+    row_limit: int = field(default=0, compare=False)
+    prompts: Optional[Dict] = field(default=None, compare=False)
+    status: str = field(default='pending', compare=False)
+    result: Any = field(default=None, compare=False, repr=False)
+    error: Optional[str] = field(default=None, compare=False)
+    dispatcher: Optional[str] = field(default=None, compare=False)
+    elapsed: float = field(default=0, compare=False)
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Optional
 from objects.object import Object
 
-@dataclass
+@dataclass(slots=True)
 class Role(Object):
     """
     store information about a CA Role
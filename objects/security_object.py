@@ -1,8 +1,9 @@
 """Common attributes for SecurityObject"""
 from dataclasses import dataclass
+from objects.model import Model
 
-@dataclass
-class SecurityObject:
+@dataclass(slots=True)
+class SecurityObject(Model):
     """
     All attributes for SecurityObject
     """
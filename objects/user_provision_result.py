@@ -0,0 +1,17 @@
+"""Outcome of provisioning one user with the bulk user provisioning"""
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class UserProvisionResult:
+    """
+    store the outcome of adding one user to a namespace:
+    created, exists (was already there) or failed
+    """
+    namespace: str
+    identity: str
+    defaultName: str
+    status: str
+    attempts: int = 1
+    error: Optional[str] = None
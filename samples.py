@@ -1,13 +1,11 @@
 import sys
 import os.path 
-import configparser
 import logging
 import getopt
 import time
 from os import path
-import getpass
-import keyring
-from services.cognos_analytics import CognosAnalyticsService
+# configparser, keyring and the services are imported where they are used,
+# so --help and other short runs do not pay for them
 
 def get_password(config,
                  environment:str,
@@ -15,6 +13,8 @@ def get_password(config,
     """	Check if there's a username defined for this CA environment namespace + user id combination 
         use keyring instead of password value in the config file       
     """
+    import getpass
+    import keyring
     if config.has_option(environment, f'{namespace_prefix}user'):
         user = config.get(environment, f'{namespace_prefix}user')
         namespace = config.get(environment, f'{namespace_prefix}namespace')
@@ -50,6 +50,8 @@ def main (argv):
             environment = arg   
         elif opt in ("-l","--log"):
             log_file = arg
+    import configparser
+    from services.cognos_analytics import CognosAnalyticsService
     config = configparser.ConfigParser(interpolation=None)
     config.read('config.ini')
     log_level = config.get('global','loglevel') \
@@ -0,0 +1,52 @@
+"""asyncio twin of the main Cognos Analytics service, entry point to all async services"""
+import logging
+from services.async_rest import AsyncRestService
+from services.async_services import (AsyncService, async_twin, AsyncUsersService,
+                                     AsyncGroupsService, AsyncRolesService,
+                                     AsyncNamespacesService, AsyncReportDataService,
+                                     AsyncContentService)
+from services.cognos_analytics import CognosAnalyticsService
+
+
+class AsyncCognosAnalyticsService(AsyncService):
+    """ Will expose all other async services throughout this one
+    usage:
+        ca_service = AsyncCognosAnalyticsService(ca_url='https://your_cognos_dispatcher:9300',
+                                                 max_concurrency=50)
+        await ca_service.login(namespace='namespace',user='user',password='pwd')
+        groups = await asyncio.gather(
+            *[ca_service.groups.get_group(group_id=gid) for gid in group_ids])
+    """
+    service_class = CognosAnalyticsService
+
+    def __init__(self,
+                 logger: logging.Logger = None,
+                 max_concurrency: int = 20,
+                 **kwargs):
+        """ Initiate the AsyncCognosAnalyticsService
+        :param max_concurrency: maximum number of requests in flight at the same time
+        """
+        self._logger = logger or logging.getLogger(__name__)
+        super().__init__(rest=AsyncRestService(max_concurrency=max_concurrency,
+                                               logger=logger, **kwargs),
+                         logger=logger)
+        self.users = AsyncUsersService(rest=self._ca_rest)
+        self.groups = AsyncGroupsService(rest=self._ca_rest)
+        self.roles = AsyncRolesService(rest=self._ca_rest)
+        self.namespaces = AsyncNamespacesService(rest=self._ca_rest)
+        self.report_data = AsyncReportDataService(rest=self._ca_rest)
+        self.content = AsyncContentService(rest=self._ca_rest)
+
+    @property
+    def sync(self) -> CognosAnalyticsService:
+        """blocking CognosAnalyticsService sharing the same session"""
+        return self._service
+
+    login = async_twin(CognosAnalyticsService.login)
+    login_with_code = async_twin(CognosAnalyticsService.login_with_code)
+    login_with_api_key = async_twin(CognosAnalyticsService.login_with_api_key)
+    logout = async_twin(CognosAnalyticsService.logout)
+
+    def close(self):
+        """shut down the worker threads"""
+        self._ca_rest.close()
@@ -0,0 +1,99 @@
+"""asyncio wrapper for rest calls
+Runs the blocking RestService calls in a thread pool, so many requests can be in flight
+while sharing the same session (headers, cookies and connection pool)
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict
+
+from services.rest import RestService
+from objects.rest_response import RestResponse
+
+
+class AsyncRestService:
+    """asyncio twin of RestService"""
+
+    def __init__(self,
+                 rest: RestService = None,
+                 max_concurrency: int = 20,
+                 logger: logging.Logger = None,
+                 **kwargs):
+        """
+        Constructor for AsyncRestService
+        :param rest: (optional) existing RestService to share headers & cookies with,
+            a new one is created from kwargs if not provided
+        :param max_concurrency: maximum number of requests in flight at the same time
+        :param logger: (optional) If your app has a logger, pass it in here.
+        """
+        self._logger = logger or logging.getLogger(__name__)
+        self._max_concurrency = max_concurrency
+        if rest is None:
+            rest = RestService(pool_maxsize=max_concurrency, **kwargs)
+        else:
+            rest.set_pool_maxsize(max_concurrency)
+        self._rest = rest
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='ca_rest')
+
+    @property
+    def rest(self) -> RestService:
+        """underlying blocking RestService"""
+        return self._rest
+
+    @property
+    def max_concurrency(self) -> int:
+        """maximum number of requests in flight"""
+        return self._max_concurrency
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """ run a blocking callable in the pool, its max_concurrency threads cap the calls
+        in flight, whichever event loop awaits them
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def get_http_header(self, key: str) -> str:
+        """get header"""
+        return self._rest.get_http_header(key)
+
+    def add_http_header(self, key: str, value: str):
+        """add header"""
+        self._rest.add_http_header(key, value)
+
+    def remove_http_header(self, key: str):
+        """remove header"""
+        self._rest.remove_http_header(key)
+
+    def get_cookie(self, key: str) -> str:
+        """get cookie"""
+        return self._rest.get_cookie(key)
+
+    def add_cookie(self, key: str, value: str):
+        """add cookie"""
+        self._rest.add_cookie(key, value)
+
+    def remove_cookie(self, key: str):
+        """remove cookie"""
+        self._rest.remove_cookie(key)
+
+    async def get(self, endpoint: str, params: Dict = None) -> RestResponse:
+        """get method wrapper"""
+        return await self.run(self._rest.get, endpoint=endpoint, params=params)
+
+    async def post(self, endpoint: str, params: Dict = None, data: Dict = None) -> RestResponse:
+        """post method wrapper"""
+        return await self.run(self._rest.post, endpoint=endpoint, params=params, data=data)
+
+    async def put(self, endpoint: str, params: Dict = None, data: Dict = None) -> RestResponse:
+        """put method wrapper"""
+        return await self.run(self._rest.put, endpoint=endpoint, params=params, data=data)
+
+    async def delete(self, endpoint: str, params: Dict = None, data: Dict = None) -> RestResponse:
+        """delete method wrapper"""
+        return await self.run(self._rest.delete, endpoint=endpoint, params=params, data=data)
+
+    def close(self):
+        """shut down the worker threads"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,99 @@
+"""asyncio twins of the Cognos Analytics services
+Every twin exposes the same method names as the blocking service, returning coroutines
+"""
+import logging
+from functools import wraps
+from typing import Callable
+
+from services.async_rest import AsyncRestService
+from services.users import UsersService
+from services.groups import GroupsService
+from services.roles import RolesService
+from services.namespaces import NamespacesService
+from services.report_data import ReportDataService
+from services.content import ContentService
+
+
+def async_twin(method: Callable) -> Callable:
+    """ build a coroutine method that runs the blocking service method
+    on the AsyncRestService pool
+    """
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self._ca_rest.run(getattr(self._service, method.__name__), *args, **kwargs)
+    return wrapper
+
+
+class AsyncService:
+    """ Base for the asyncio twins, wraps an instance of the blocking service
+    sharing the session of the AsyncRestService
+    """
+    service_class = None
+
+    def __init__(self, rest: AsyncRestService, logger: logging.Logger = None):
+        """ Initiate the Service
+        """
+        self._ca_rest = rest
+        self._service = self.service_class(rest=rest.rest, logger=logger)
+
+
+class AsyncUsersService(AsyncService):
+    """ Users related endpoints"""
+    service_class = UsersService
+    get_users = async_twin(UsersService.get_users)
+    add_user = async_twin(UsersService.add_user)
+    add_users_bulk = async_twin(UsersService.add_users_bulk)
+    delete_user = async_twin(UsersService.delete_user)
+    copy_user_profile = async_twin(UsersService.copy_user_profile)
+    copy_user_profile_chunked = async_twin(UsersService.copy_user_profile_chunked)
+
+
+class AsyncGroupsService(AsyncService):
+    """ Groups related endpoints"""
+    service_class = GroupsService
+    get_group = async_twin(GroupsService.get_group)
+    get_child_groups = async_twin(GroupsService.get_child_groups)
+    get_group_members = async_twin(GroupsService.get_group_members)
+    delete_group = async_twin(GroupsService.delete_group)
+    create_group_as_child = async_twin(GroupsService.create_group_as_child)
+    add_group_members = async_twin(GroupsService.add_group_members)
+    remove_group_member = async_twin(GroupsService.remove_group_member)
+
+
+class AsyncRolesService(AsyncService):
+    """ Roles related endpoints"""
+    service_class = RolesService
+    get_role = async_twin(RolesService.get_role)
+    get_child_roles = async_twin(RolesService.get_child_roles)
+    get_role_members = async_twin(RolesService.get_role_members)
+    delete_role = async_twin(RolesService.delete_role)
+    create_role_as_child = async_twin(RolesService.create_role_as_child)
+    add_role_members = async_twin(RolesService.add_role_members)
+    remove_role_member = async_twin(RolesService.remove_role_member)
+
+
+class AsyncNamespacesService(AsyncService):
+    """ Namespaces related endpoints"""
+    service_class = NamespacesService
+    get_list_of_namespaces = async_twin(NamespacesService.get_list_of_namespaces)
+    get_namespace_items = async_twin(NamespacesService.get_namespace_items)
+    get_namespace_snapshot = async_twin(NamespacesService.get_namespace_snapshot)
+
+
+class AsyncReportDataService(AsyncService):
+    """ CMS related endpoints"""
+    service_class = ReportDataService
+    login = async_twin(ReportDataService.login)
+    run_report_sync = async_twin(ReportDataService.run_report_sync)
+    run_report_async = async_twin(ReportDataService.run_report_async)
+    run_report_partitioned_columnar = async_twin(ReportDataService.run_report_partitioned_columnar)
+    run_report_columnar = async_twin(ReportDataService.run_report_columnar)
+
+
+class AsyncContentService(AsyncService):
+    """ Content related endpoints"""
+    service_class = ContentService
+    get_content = async_twin(ContentService.get_content)
+    get_content_items = async_twin(ContentService.get_content_items)
+    update_content = async_twin(ContentService.update_content)
+    update_policies_bulk = async_twin(ContentService.update_policies_bulk)
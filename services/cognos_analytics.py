@@ -1,32 +1,45 @@
 """Main Cognos Analytics interaction service, entry point to all others
 will put login / logout methods here"""
+import importlib
 import logging
 from services.rest import RestService
-from services.users import UsersService
-from services.groups import GroupsService
-from services.roles import RolesService
-from services.namespaces import NamespacesService
-from services.report_data import ReportDataService
-from services.content import ContentService
+
+# attribute -> (module, class) of the services, imported and created on first use
+# so short commands only pay for the services they call
+SERVICES = {
+    'users': ('services.users', 'UsersService'),
+    'groups': ('services.groups', 'GroupsService'),
+    'roles': ('services.roles', 'RolesService'),
+    'namespaces': ('services.namespaces', 'NamespacesService'),
+    'report_data': ('services.report_data', 'ReportDataService'),
+    'content': ('services.content', 'ContentService'),
+}
 
 
 class CognosAnalyticsService:
     """ Will expose all other services throughout this one
+    the services (users, groups, roles, namespaces, report_data, content)
+    are created on first access
     """
 
-    def __init__(self, logger: logging.Logger = None, **kwargs):
+    def __init__(self, logger: logging.Logger = None, rest: RestService = None, **kwargs):
         """ Initiate the CognosAnalyticsService
+        :param rest: (optional) existing RestService to use, created from kwargs otherwise
         """
-        self._ca_rest = RestService(**kwargs)
+        self._ca_rest = rest or RestService(**kwargs)
         self._base_endpoint = '/api/v1/session'
-        self.users = UsersService(rest=self._ca_rest)
-        self.groups = GroupsService(rest=self._ca_rest)
-        self.roles = RolesService(rest=self._ca_rest)
-        self.namespaces = NamespacesService(rest=self._ca_rest)
-        self.report_data = ReportDataService(rest=self._ca_rest)
-        self.content = ContentService(rest=self._ca_rest)
         self._logger = logger or logging.getLogger(__name__)
 
+    def __getattr__(self, name: str):
+        """ import and create a service the first time it is used,
+        later lookups find it in the instance dict and do not get here
+        """
+        if name not in SERVICES:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        module_name, class_name = SERVICES[name]
+        service_class = getattr(importlib.import_module(module_name), class_name)
+        return self.__dict__.setdefault(name, service_class(rest=self._ca_rest))
+
     def login(self, namespace="", user="", password=""):
         """ login to CA using provided credentials username / password
         https://www.ibm.com/docs/en/cognos-analytics/12.0.0?topic=window-rest-sample
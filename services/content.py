@@ -1,9 +1,19 @@
 """Content related REST endpoints"""
 import logging
-from dataclasses import fields
+from collections import deque
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from typing import Callable, Dict, Iterator, List
 from services.rest import RestService
+from services.pagination import iter_pages, page_params
+from exceptions.rest_service_exception import RestServiceException
 from objects.content_object import ContentObject
 from objects.policy import Policy
+from objects.policy_update_result import PolicyUpdateResult
+
+# content types that can have child items
+CONTAINER_TYPES = ('content', 'folder', 'package', 'myFolders', 'teamFolders')
+
 
 class ContentService:
     """ Content related endpoints"""
@@ -24,65 +34,151 @@ class ContentService:
             endpoint=f'{self._base_endpoint}/{content_id}',
             params={'fields':','.join(content_fields_list)} if content_fields_list is not None 
             else None)
+        content_object = ContentObject.from_dict(response.data)
         # need to return policies
-        permissions_list = []
-        if 'policies' in response.data:
-            for element in response.data["policies"]:
-                permissions_list.append(Policy(
-                        permissions= element['permissions'],
-                        securityObject =  element['securityObject'])
-                    )
-
-        return ContentObject(id=response.data['id'],
-                             type=response.data['type'],
-                             defaultName=response.data['defaultName'],
-                             modificationTime=response.data['modificationTime'],
-                             policies=permissions_list)
+        if content_object.policies is None:
+            content_object.policies = []
+        return content_object
 
     def get_content_items(self,
                     content_id: str ='') -> [ContentObject]:
         """ Get content objects items, e.g. objects in folder
         """
-        response = self._ca_rest.get(
-            endpoint=f'{self._base_endpoint}/{content_id}/items')
-        object_list = []
-        if 'content' in response.data:
-            for obj in response.data['content']:
-                object_list.append(
-                    ContentObject(id=obj['id'],
-                                type=obj['type'],
-                                modificationTime=obj['modificationTime'],
-                                defaultName=obj['defaultName'])
-                )
-        return object_list
+        return list(self.iter_content_items(content_id=content_id))
+
+    def iter_content_items(self,
+                           content_id: str = '',
+                           page_size: int = None,
+                           prefetch: bool = True) -> Iterator[ContentObject]:
+        """ Lazily list content objects items, e.g. objects in folder,
+        paging with page_size items per request if set, see pagination.iter_pages
+        """
+        def fetch_page(offset, limit):
+            response = self._ca_rest.get(
+                endpoint=f'{self._base_endpoint}/{content_id}/items',
+                params=page_params(None, offset, limit))
+            return response.data['content'] if 'content' in response.data else []
+        return (ContentObject.from_dict(obj)
+                for obj in iter_pages(fetch_page, page_size, prefetch))
     
+    def walk(self,
+             content_id: str = 'team_folders',
+             max_depth: int = None,
+             content_types: [str] = None,
+             fetch_policies: bool = False,
+             max_workers: int = 8,
+             container_types: [str] = CONTAINER_TYPES,
+             on_error: Callable[[str, Exception], None] = None) -> Iterator[ContentObject]:
+        """ Crawl the content store breadth-first starting from content_id,
+        listing up to max_workers folders at once and yielding objects as they arrive
+        (not in a stable order). Only the ids of folders waiting to be listed are kept.
+        :param content_id: root object to start from, not returned itself
+        :param max_depth: how many levels to descend, 1 means only the root items
+        :param content_types: only yield objects of these types (folders are still crawled)
+        :param fetch_policies: also read policies of each yielded object
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        :param container_types: object types to descend into
+        :param on_error: (optional) called with the id and the exception of every folder
+            that could not be listed or object whose policies could not be read,
+            their subtrees or objects are missing from the walk
+        """
+        pending_folders = deque([(content_id, 0)])
+        pending_policies = deque()
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending_folders or pending_policies or running:
+                # policy reads first, they hold the already listed objects in memory
+                while pending_policies and len(running) < max_workers:
+                    obj = pending_policies.popleft()
+                    running[pool.submit(
+                        self.get_content, content_id=obj.id,
+                        content_fields_list=['defaultName', 'modificationTime', 'policies']
+                        )] = (obj.id, None)
+                while pending_folders and len(running) < max_workers:
+                    folder_id, depth = pending_folders.popleft()
+                    running[pool.submit(self.get_content_items, content_id=folder_id)] = \
+                        (folder_id, depth + 1)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, depth = running.pop(future)
+                    try:
+                        result = future.result()
+                    except (RestServiceException, KeyError) as exc:
+                        self._logger.error('Failed to read content %s: %s', source, exc)
+                        if on_error is not None:
+                            on_error(source, exc)
+                        continue
+                    if depth is None:
+                        yield result
+                        continue
+                    for obj in result:
+                        if obj.type in container_types and (max_depth is None or depth < max_depth):
+                            pending_folders.append((obj.id, depth))
+                        if content_types is not None and obj.type not in content_types:
+                            continue
+                        if fetch_policies:
+                            pending_policies.append(obj)
+                        else:
+                            yield obj
+
     def update_content(self,
                     content_object: ContentObject):
-        """ Update content object
+        """ Update content object, returns True if the update succeeded
         """
-        class_attributes = set(f.name for f in fields(ContentObject))
-        data = {}
-        for attr in class_attributes:
-            if attr not in ('policies'):
-                data[attr] = content_object.__getattribute__(attr)
-
-        #TODO: there must be a better way to deserialize nested class to JSON
-        policy_list = []
-        for policy in content_object.policies:
-            #print (policy.to_json())
-            policy_serialized = {}
-            permission_list = []
-            for permission in policy.permissions:
-                permission_list.append(permission)
-            policy_serialized['securityObject'] = policy.securityObject
-            policy_serialized['permissions'] = permission_list
-            policy_list.append(policy_serialized)
-        data['policies'] = policy_list
+        data = content_object.to_dict()
+        if data['policies'] is None:
+            # not read with the object, leave the policies as they are
+            del data['policies']
         response = self._ca_rest.put(
             endpoint=f'{self._base_endpoint}/{content_object.id}',
             data=data)
         if response.status_code == 204:
             logging.debug('Object %s updated sucessfully',content_object.defaultName)
-        else:
-            logging.warning('Updating object %s failed with %s'
-                         ,content_object.defaultName, response.message)
\ No newline at end of file
+            return True
+        logging.warning('Updating object %s failed with %s'
+                     ,content_object.defaultName, response.message)
+        return False
+
+    def _update_policies(self, content_id: str, policies: [Policy], dry_run: bool):
+        """ read current policies of one object and write the target ones if they differ"""
+        current = self.get_content(
+            content_id=content_id,
+            content_fields_list=['defaultName', 'modificationTime', 'policies'])
+        if {policy.key() for policy in current.policies} == \
+                {policy.key() for policy in policies}:
+            return PolicyUpdateResult(content_id=content_id, status='unchanged')
+        if dry_run:
+            return PolicyUpdateResult(content_id=content_id, status='drifted')
+        current.policies = policies
+        if self.update_content(current):
+            return PolicyUpdateResult(content_id=content_id, status='updated')
+        return PolicyUpdateResult(content_id=content_id, status='failed',
+                                  error='update rejected by the server')
+
+    def update_policies_bulk(self,
+                             target_policies: Dict[str, List[Policy]],
+                             max_workers: int = 8,
+                             dry_run: bool = False) -> List[PolicyUpdateResult]:
+        """ set the policies of many objects, reading the current policies concurrently
+        and writing only the objects whose policies differ from the target
+        (the order of policies and permissions is ignored)
+        :param target_policies: target policies by content object id
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        :param dry_run: only report the objects that would be updated as 'drifted'
+        :return: result per object with status unchanged, drifted, updated or failed
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(self._update_policies, content_id, policies, dry_run):
+                       content_id for content_id, policies in target_policies.items()}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except (RestServiceException, KeyError) as exc:
+                    results.append(PolicyUpdateResult(content_id=futures[future],
+                                                      status='failed', error=str(exc)))
+        counts = Counter(result.status for result in results)
+        self._logger.info('Bulk policy update of %d objects: %s', len(results), dict(counts))
+        return results
\ No newline at end of file
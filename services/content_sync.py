@@ -0,0 +1,184 @@
+"""Incremental content sync driven by modificationTime,
+keeping the previously seen content objects in a local SQLite index
+"""
+import logging
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator
+
+from exceptions.rest_service_exception import RestServiceException
+from services.content import ContentService, CONTAINER_TYPES
+from objects.content_object import ContentObject
+from objects.content_change import ContentChange
+
+
+class ContentSync:
+    """ Compare the content store with the local index and emit ContentChanges,
+    only descending into folders that are new or whose modificationTime changed
+    usage:
+        sync = ContentSync(content=ca_service.content, index_path='content_index.db')
+        for change in sync.sync(content_id='team_folders'):
+            print(change.event, change.content_object.defaultName)
+    """
+
+    def __init__(self,
+                 content: ContentService,
+                 index_path: str = 'content_index.db',
+                 container_types: [str] = CONTAINER_TYPES,
+                 logger: logging.Logger = None):
+        """
+        :param content: ContentService to read the content store with
+        :param index_path: SQLite file keeping the previously seen objects
+        :param container_types: object types to descend into
+        """
+        self._content = content
+        self._container_types = container_types
+        self._logger = logger or logging.getLogger(__name__)
+        self._db = sqlite3.connect(index_path)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS content (
+                                id TEXT PRIMARY KEY,
+                                parent_id TEXT,
+                                type TEXT,
+                                defaultName TEXT,
+                                modificationTime TEXT,
+                                listed INTEGER DEFAULT 1)''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS content_parent ON content (parent_id)')
+        self._db.commit()
+
+    def _indexed_children(self, parent_id: str) -> dict:
+        return {row[0]: row for row in self._db.execute(
+            'SELECT id, type, defaultName, modificationTime, listed FROM content '
+            'WHERE parent_id = ?',
+            (parent_id,))}
+
+    def _delete_subtree(self, object_id: str, parent_id: str) -> Iterator[ContentChange]:
+        rows = self._db.execute('''WITH RECURSIVE subtree(id) AS (
+                                       SELECT ?
+                                       UNION ALL
+                                       SELECT content.id FROM content
+                                       JOIN subtree ON content.parent_id = subtree.id)
+                                   SELECT id, parent_id, type, defaultName, modificationTime
+                                   FROM content WHERE id IN subtree''',
+                                (object_id,)).fetchall()
+        self._db.executemany('DELETE FROM content WHERE id = ?', [(row[0],) for row in rows])
+        for row in rows:
+            yield ContentChange(event='deleted',
+                                content_object=ContentObject(id=row[0], type=row[2],
+                                                             defaultName=row[3],
+                                                             modificationTime=row[4]),
+                                parent_id=row[1] if row[0] != object_id else parent_id)
+
+    def _unlisted_folders(self, content_id: str) -> [str]:
+        """ folders under content_id whose listing failed or was not reached before,
+        parents first
+        """
+        rows = self._db.execute('''WITH RECURSIVE subtree(id, depth) AS (
+                                       SELECT ?, 0
+                                       UNION ALL
+                                       SELECT content.id, subtree.depth + 1 FROM content
+                                       JOIN subtree ON content.parent_id = subtree.id)
+                                   SELECT content.id FROM content
+                                   JOIN subtree ON content.id = subtree.id
+                                   WHERE content.listed = 0
+                                   ORDER BY subtree.depth''', (content_id,))
+        return [row[0] for row in rows]
+
+    def _compare(self, parent_id: str, items: [ContentObject], full: bool, queued: set):
+        """ apply the listing of one folder to the index,
+        returns the changes and the child folders to descend into.
+        The child folders are stored as not listed until their own listing is applied,
+        so they are descended into again if it fails or the sync is stopped before
+        """
+        changes = []
+        descend = []
+        indexed = self._indexed_children(parent_id)
+        for obj in items:
+            row = indexed.pop(obj.id, None)
+            if row is None:
+                event = 'added'
+            elif row[3] != obj.modificationTime or row[2] != obj.defaultName:
+                event = 'changed'
+            else:
+                event = None
+            container = obj.type in self._container_types
+            # only folders wait to be listed
+            listed = not container or (row is not None and row[4] != 0)
+            if event is not None:
+                changes.append(ContentChange(event=event, content_object=obj,
+                                             parent_id=parent_id))
+            # folders queued in this sync already keep their state until they are listed
+            if container and (full or event is not None or not listed) \
+                    and obj.id not in queued:
+                descend.append(obj.id)
+                queued.add(obj.id)
+                listed = False
+            if event is not None or not listed:
+                self._db.execute('INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?, ?, ?)',
+                                 (obj.id, parent_id, obj.type, obj.defaultName,
+                                  obj.modificationTime, int(listed)))
+        for object_id in indexed:
+            changes.extend(self._delete_subtree(object_id, parent_id))
+        self._db.execute('UPDATE content SET listed = 1 WHERE id = ?', (parent_id,))
+        return changes, descend
+
+    def sync(self,
+             content_id: str = 'team_folders',
+             full: bool = False,
+             max_workers: int = 8) -> Iterator[ContentChange]:
+        """ crawl the content under content_id and yield the changes since the last sync,
+        the changes of a folder are committed to the index once they have all been yielded,
+        folders that failed to list or were not reached are read again next time.
+        Folders with an unchanged modificationTime are not descended into,
+        use full=True to re-read the whole tree, e.g. for a weekly reconciliation
+        :param content_id: root object to start from
+        :param full: descend into every folder
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        """
+        # folders left unlisted by an earlier sync are read again even if their parents
+        # did not change
+        pending = deque(dict.fromkeys([content_id] + self._unlisted_folders(content_id)))
+        queued = set(pending)
+        running = {}
+        counts = {'added': 0, 'changed': 0, 'deleted': 0}
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                while pending or running:
+                    while pending and len(running) < max_workers:
+                        folder_id = pending.popleft()
+                        running[pool.submit(self._content.get_content_items,
+                                            content_id=folder_id)] = folder_id
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        folder_id = running.pop(future)
+                        try:
+                            items = future.result()
+                        except (RestServiceException, KeyError) as exc:
+                            # the folder stays not listed, it is read again next time
+                            self._logger.error('Failed to read content %s: %s', folder_id, exc)
+                            continue
+                        if folder_id != content_id and not self._db.execute(
+                                'SELECT 1 FROM content WHERE id = ?', (folder_id,)).fetchone():
+                            # deleted with its parent while it was listed
+                            continue
+                        changes, descend = self._compare(folder_id, items, full, queued)
+                        pending.extend(descend)
+                        for change in changes:
+                            counts[change.event] += 1
+                            yield change
+                        self._db.commit()
+        finally:
+            # drop the changes of a folder whose changes were not all yielded
+            self._db.rollback()
+            self._logger.info('Content sync of %s: %d added, %d changed, %d deleted',
+                              content_id, counts['added'], counts['changed'], counts['deleted'])
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """SQLite connection of the index, to keep other tables in the same file"""
+        return self._db
+
+    def close(self):
+        """close the index"""
+        self._db.close()
@@ -1,7 +1,8 @@
 """Groups related REST endpoints"""
 import logging
-from dataclasses import fields
+from typing import Iterator
 from services.rest import RestService
+from services.pagination import iter_pages, page_params
 from objects.object import Object
 from objects.group import Group
 from objects.user import User
@@ -24,24 +25,27 @@ class GroupsService:
         """
         response = self._ca_rest.get(
             endpoint=f'{self._base_endpoint}/{group_id}')
-        return Group(
-            **{k:v for k,v in response.data.items() if k in set(f.name for f in fields(Group))}
-        )
+        return Group.from_dict(response.data)
 
     def get_child_groups(self, parent_id='') -> [Group]:
         """ Get groups by namespace folde ID
         https://developer.ibm.com/apis/catalog/cognosanalytics--cognos-analytics-rest-api/api/API--cognosanalytics--cognos-analytics#list_group_objects
         """
-        response = self._ca_rest.get(
-            endpoint=f'{self._base_endpoint}',
-            params={'parent_id': parent_id})
-        groups = []
-        if 'groups' in response.data:
-            for grp in response.data['groups']:
-                groups.append(Group(
-                    **{k:v for k,v in grp.items() if k in set(f.name for f in fields(Group))}
-                    ))
-        return groups
+        return list(self.iter_child_groups(parent_id=parent_id))
+
+    def iter_child_groups(self,
+                          parent_id='',
+                          page_size: int = None,
+                          prefetch: bool = True) -> Iterator[Group]:
+        """ Lazily list groups by namespace folder ID,
+        paging with page_size groups per request if set, see pagination.iter_pages
+        """
+        def fetch_page(offset, limit):
+            response = self._ca_rest.get(
+                endpoint=f'{self._base_endpoint}',
+                params=page_params({'parent_id': parent_id}, offset, limit))
+            return response.data['groups'] if 'groups' in response.data else []
+        return (Group.from_dict(grp) for grp in iter_pages(fetch_page, page_size, prefetch))
 
     def get_group_members(self, group: Group) -> Members:
         """ Get group members"""
@@ -50,16 +54,12 @@ class GroupsService:
         groups = []
         if 'groups' in response.data:
             for grp in response.data['groups']:
-                groups.append(Group(
-                    **{k:v for k,v in grp.items() if k in set(f.name for f in fields(Group))}
-                    ))
+                groups.append(Group.from_dict(grp))
         users = []
         if 'users' in response.data:
             for usr in response.data['users']:
-                users.append(User(
-                    **{k:v for k,v in usr.items() if k in set(f.name for f in fields(User))}
-                    ))
-        return Members(**{'groups': groups, 'users': users})
+                users.append(User.from_dict(usr))
+        return Members(groups=groups, users=users)
 
     def delete_group(self, group: Group):
         """ delete group
@@ -89,7 +89,7 @@ class GroupsService:
                           group: Group,
                           groups_to_add: [Group] = None, 
                           users_to_add: [User] = None):
-        """	adding group members : users & groups
+        """	adding group members : users & groups, returns True if the server accepted them
         """
         self._logger.debug('Adding members to group to %s, groups %s, users %s ',
                            group.defaultName, groups_to_add, users_to_add)
@@ -105,13 +105,14 @@ class GroupsService:
                             0 if groups_to_add is None else len(groups_to_add),
                             0 if users_to_add is None else len(users_to_add),
                             group.defaultName)
-        else:
-            self._logger.error(
-                'Changing group %s members failed:%s', 
-                group.defaultName, response.message, exc_info=1)
+            return True
+        self._logger.error(
+            'Changing group %s members failed:%s', 
+            group.defaultName, response.message, exc_info=1)
+        return False
 
     def remove_group_member(self, group: Group, member: Object, member_type='user'):
-        """	removing specified group member from group
+        """	removing specified group member from group, returns True if it was removed
         https://developer.ibm.com/apis/catalog/cognosanalytics--cognos-analytics-rest-api/api/API--cognosanalytics--cognos-analytics#delete_member_from_group
         """
         response = self._ca_rest.delete(
@@ -119,6 +120,7 @@ class GroupsService:
         if response.status_code in (200,204):
             self._logger.info('Removed member %s from group %s',
                               member.defaultName, group.defaultName)
-        else:
-            self._logger.error(
-                'Changing group members failed:%s', response.message, exc_info=1)
+            return True
+        self._logger.error(
+            'Changing group members failed:%s', response.message, exc_info=1)
+        return False
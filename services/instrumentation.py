@@ -0,0 +1,293 @@
+"""Per endpoint latency and throughput metrics for RestService
+Counts requests, retries and bytes per endpoint template, keeps latency histograms
+split into network and JSON decode time, optionally times the model construction
+per class, and exports it all as a Prometheus textfile or a JSON snapshot.
+usage:
+    metrics = Instrumentation()
+    ca_service = CognosAnalyticsService(ca_url=..., instrumentation=metrics)
+    ...
+    metrics.write_prometheus('/var/lib/node_exporter/cognos.prom')
+"""
+import bisect
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from objects import model
+
+# upper bounds of the latency histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# path segments kept as they are in endpoint templates, anything else is an object id
+_LITERAL_SEGMENT = re.compile(r'[A-Za-z_]+|v\d+')
+
+
+def endpoint_template(endpoint: str) -> str:
+    """ endpoint with the query string dropped and the object ids replaced by {id},
+    e.g. /api/v1/groups/{id}/members
+    """
+    path = endpoint.split('?', 1)[0]
+    return '/'.join(segment if not segment or _LITERAL_SEGMENT.fullmatch(segment) else '{id}'
+                    for segment in path.split('/'))
+
+
+@dataclass
+class RequestMetrics:
+    """
+    measurements of one request sent by RestService, passed to the post request hooks
+    network_seconds covers the attempts only, not the waits between retries
+    """
+    method: str
+    endpoint: str
+    template: str
+    status_code: Optional[int] = None
+    attempts: int = 0
+    bytes_out: int = 0
+    bytes_in: int = 0
+    network_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class Histogram:
+    """cumulative latency histogram in the Prometheus style"""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # one more bucket for +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """add a measurement"""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, count of values at or below it) including +Inf"""
+        result = []
+        running = 0
+        for bound, count in zip(list(self.bounds) + ['+Inf'], self.counts):
+            running += count
+            result.append((str(bound), running))
+        return result
+
+    def to_dict(self) -> dict:
+        """ JSON friendly form"""
+        return {'buckets': dict(self.cumulative()), 'sum': self.total, 'count': self.count}
+
+
+class EndpointStats:
+    """totals of one (method, endpoint template)"""
+
+    __slots__ = ('requests', 'errors', 'statuses', 'retries', 'bytes_out', 'bytes_in',
+                 'network', 'decode')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.requests = 0
+        self.errors = 0
+        self.statuses: Dict[int, int] = {}
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.network = Histogram(bounds)
+        self.decode = Histogram(bounds)
+
+    def to_dict(self) -> dict:
+        """ JSON friendly form"""
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'statuses': {str(status): count for status, count in self.statuses.items()},
+                'retries': self.retries,
+                'bytes_out': self.bytes_out,
+                'bytes_in': self.bytes_in,
+                'network_seconds': self.network.to_dict(),
+                'decode_seconds': self.decode.to_dict()}
+
+
+class Instrumentation:
+    """ Collects RequestMetrics from one or more RestServices (share one instance,
+    e.g. via SessionPool kwargs) and calls the registered hooks.
+    RestService skips all of it when no Instrumentation is set.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, time_models: bool = False):
+        """
+        :param buckets: upper bounds of the latency histogram buckets in seconds
+        :param time_models: start timing Model.from_dict per class right away,
+            see start_timing_models
+        """
+        self._buckets = tuple(sorted(buckets))
+        self._endpoints: Dict[Tuple[str, str], EndpointStats] = {}
+        self._models: Dict[str, List] = {}
+        self._pre_hooks: List[Callable] = []
+        self._post_hooks: List[Callable] = []
+        self._lock = threading.Lock()
+        self._model_hook = None
+        if time_models:
+            self.start_timing_models()
+
+    def add_pre_request_hook(self, hook: Callable[[str, str, Dict], None]):
+        """ call hook(method, endpoint, params) before a request is sent"""
+        self._pre_hooks.append(hook)
+
+    def add_post_request_hook(self, hook: Callable[[RequestMetrics], None]):
+        """ call hook(RequestMetrics) after a request completed or failed"""
+        self._post_hooks.append(hook)
+
+    def start(self, method: str, endpoint: str, params: Dict = None) -> RequestMetrics:
+        """ a request is about to be sent, returns the RequestMetrics to fill in"""
+        for hook in self._pre_hooks:
+            hook(method, endpoint, params)
+        return RequestMetrics(method=method, endpoint=endpoint,
+                              template=endpoint_template(endpoint))
+
+    def finish(self, metrics: RequestMetrics):
+        """ a request completed or failed, add it to the totals and call the hooks"""
+        key = (metrics.method, metrics.template)
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats(self._buckets)
+            stats.requests += 1
+            if metrics.error is not None:
+                stats.errors += 1
+            if metrics.status_code is not None:
+                stats.statuses[metrics.status_code] = \
+                    stats.statuses.get(metrics.status_code, 0) + 1
+            stats.retries += max(0, metrics.attempts - 1)
+            stats.bytes_out += metrics.bytes_out
+            stats.bytes_in += metrics.bytes_in
+            stats.network.observe(metrics.network_seconds)
+            if metrics.decode_seconds:
+                stats.decode.observe(metrics.decode_seconds)
+        for hook in self._post_hooks:
+            hook(metrics)
+
+    def record_model(self, cls: type, seconds: float):
+        """ time spent building one object of the class with from_dict"""
+        with self._lock:
+            totals = self._models.get(cls.__name__)
+            if totals is None:
+                totals = self._models[cls.__name__] = [0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def start_timing_models(self):
+        """ time Model.from_dict per class until stop_timing_models or close.
+        Timing is process wide: objects built outside the instrumented services count too,
+        and the Instrumentation that started last is the one timing.
+        Nested objects are included in the time of their parent as well
+        """
+        self._model_hook = self.record_model
+        model.set_from_dict_hook(self._model_hook)
+
+    def stop_timing_models(self):
+        """ stop timing the model construction, unless another Instrumentation took it over"""
+        if self._model_hook is not None:
+            model.remove_from_dict_hook(self._model_hook)
+            self._model_hook = None
+
+    @contextmanager
+    def timing_models(self):
+        """ time Model.from_dict per class within a with block"""
+        self.start_timing_models()
+        try:
+            yield self
+        finally:
+            self.stop_timing_models()
+
+    def close(self):
+        """ stop timing the model construction, if this instance does"""
+        self.stop_timing_models()
+
+    def reset(self):
+        """ drop the collected totals, keeping the hooks"""
+        with self._lock:
+            self._endpoints.clear()
+            self._models.clear()
+
+    def snapshot(self) -> dict:
+        """ totals per endpoint and model class as a JSON friendly dict"""
+        with self._lock:
+            return {
+                'endpoints': [dict(method=method, endpoint=template, **stats.to_dict())
+                              for (method, template), stats in sorted(self._endpoints.items())],
+                'models': {name: {'count': count, 'seconds': seconds}
+                           for name, (count, seconds) in sorted(self._models.items())}}
+
+    def write_json(self, path: str):
+        """ write the snapshot to a JSON file"""
+        _write_atomically(path, json.dumps(self.snapshot(), indent=2))
+
+    def prometheus(self, prefix: str = 'cognos_rest') -> str:
+        """ totals in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+
+        def histogram(name: str, labels: str, values: Histogram):
+            for bound, count in values.cumulative():
+                lines.append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{prefix}_{name}_sum{{{labels}}} {values.total}')
+            lines.append(f'{prefix}_{name}_count{{{labels}}} {values.count}')
+
+        with self._lock:
+            endpoints = [(f'method="{method}",endpoint="{_escape(template)}"', stats)
+                         for (method, template), stats in sorted(self._endpoints.items())]
+            metric('requests_total', 'counter', 'Requests sent by status code')
+            for labels, stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'{prefix}_requests_total{{{labels},status="{status}"}} {count}')
+            metric('errors_total', 'counter', 'Requests that failed without a usable response')
+            for labels, stats in endpoints:
+                lines.append(f'{prefix}_errors_total{{{labels}}} {stats.errors}')
+            metric('retries_total', 'counter', 'Attempts beyond the first')
+            for labels, stats in endpoints:
+                lines.append(f'{prefix}_retries_total{{{labels}}} {stats.retries}')
+            metric('sent_bytes_total', 'counter', 'Request body bytes')
+            for labels, stats in endpoints:
+                lines.append(f'{prefix}_sent_bytes_total{{{labels}}} {stats.bytes_out}')
+            metric('received_bytes_total', 'counter', 'Response body bytes')
+            for labels, stats in endpoints:
+                lines.append(f'{prefix}_received_bytes_total{{{labels}}} {stats.bytes_in}')
+            metric('network_seconds', 'histogram', 'Time on the wire per request')
+            for labels, stats in endpoints:
+                histogram('network_seconds', labels, stats.network)
+            metric('decode_seconds', 'histogram', 'JSON decode time per response')
+            for labels, stats in endpoints:
+                histogram('decode_seconds', labels, stats.decode)
+            metric('models_built_total', 'counter', 'Objects built with from_dict')
+            for name, (count, _) in sorted(self._models.items()):
+                lines.append(f'{prefix}_models_built_total{{model="{name}"}} {count}')
+            metric('model_build_seconds_total', 'counter', 'Time spent in from_dict')
+            for name, (_, seconds) in sorted(self._models.items()):
+                lines.append(f'{prefix}_model_build_seconds_total{{model="{name}"}} {seconds}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, prefix: str = 'cognos_rest'):
+        """ write a textfile for the node_exporter textfile collector"""
+        _write_atomically(path, self.prometheus(prefix))
+
+
+def _escape(value: str) -> str:
+    """escape a Prometheus label value"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomically(path: str, text: str):
+    """write to a temporary file and rename it, so readers never see a partial file"""
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp_path, path)
@@ -0,0 +1,73 @@
+"""JSON codecs for RestService
+orjson or ujson are used when installed, the standard library json otherwise
+"""
+import json
+
+
+class JsonCodec:
+    """standard library json codec, decodes directly from bytes"""
+    name = 'json'
+    # raised by loads for invalid JSON, the errors of orjson and ujson subclass it too
+    decode_error = ValueError
+
+    def loads(self, data: bytes):
+        """decode JSON bytes"""
+        return json.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        """encode to JSON bytes"""
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson codec https://github.com/ijl/orjson"""
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def loads(self, data: bytes):
+        """decode JSON bytes"""
+        return self._orjson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        """encode to JSON bytes"""
+        return self._orjson.dumps(obj)
+
+
+class UjsonCodec(JsonCodec):
+    """ujson codec https://github.com/ultrajson/ultrajson"""
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def loads(self, data: bytes):
+        """decode JSON bytes"""
+        return self._ujson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        """encode to JSON bytes"""
+        return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def default_codec() -> JsonCodec:
+    """fastest available codec"""
+    for codec_class in (OrjsonCodec, UjsonCodec):
+        try:
+            return codec_class()
+        except ImportError:
+            pass
+    return JsonCodec()
+
+
+def is_json(content_type: str, content: bytes) -> bool:
+    """ decide by the Content-Type header whether the body is JSON,
+    bodies without a Content-Type are checked for a leading { or [
+    """
+    if content_type:
+        media_type = content_type.split(';')[0].strip().lower()
+        return media_type.endswith('json') or media_type.endswith('javascript')
+    return content.lstrip()[:1] in (b'{', b'[')
@@ -0,0 +1,203 @@
+"""Cached transitive group / role membership graph
+Fetches direct members of groups and roles concurrently and answers
+effective membership questions from memory
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, List, Set
+
+from exceptions.rest_service_exception import RestServiceException
+from services.groups import GroupsService
+from services.roles import RolesService
+from objects.object import Object
+from objects.role import Role
+from objects.user import User
+from objects.members import Members
+
+
+class MembershipGraph:
+    """ Membership graph of groups and roles, including nested groups
+    usage:
+        graph = MembershipGraph(groups=ca_service.groups, roles=ca_service.roles)
+        graph.load(ca_service.roles.get_child_roles(parent_id='xOg__'))
+        graph.effective_containers(user)   # all groups & roles of the user
+        graph.transitive_members(role)     # all users & groups in the role
+    """
+
+    def __init__(self,
+                 groups: GroupsService,
+                 roles: RolesService,
+                 ttl: float = 3600,
+                 max_workers: int = 8,
+                 logger: logging.Logger = None):
+        """
+        :param groups: GroupsService to read group members with
+        :param roles: RolesService to read role members with
+        :param ttl: seconds the members of a group or role are kept before reading them again
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        """
+        self._groups = groups
+        self._roles = roles
+        self._ttl = ttl
+        self._max_workers = max_workers
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # container id -> (time read, direct Members)
+        self._members: Dict[str, tuple] = {}
+        # member id -> ids of the groups & roles it directly belongs to
+        self._parents: Dict[str, Set[str]] = {}
+        self._objects: Dict[str, Object] = {}
+        self._up_closure: Dict[str, Set[str]] = {}
+        self._down_closure: Dict[str, Set[str]] = {}
+
+    def _read_members(self, container: Object) -> Members:
+        if isinstance(container, Role):
+            return self._roles.get_role_members(role=container)
+        return self._groups.get_group_members(group=container)
+
+    def _is_fresh(self, container_id: str) -> bool:
+        entry = self._members.get(container_id)
+        return entry is not None and time.monotonic() - entry[0] < self._ttl
+
+    def _set_members(self, container: Object, members: Members):
+        old = self._members.get(container.id)
+        if old is not None:
+            for member in old[1].users + old[1].groups:
+                self._parents.get(member.id, set()).discard(container.id)
+        self._members[container.id] = (time.monotonic(), members)
+        self._objects[container.id] = container
+        for member in members.users + members.groups:
+            self._objects.setdefault(member.id, member)
+            self._parents.setdefault(member.id, set()).add(container.id)
+
+    def load(self, containers: Iterable[Object], nested: bool = True):
+        """ read the members of the groups and roles (and of their nested groups),
+        skipping the ones read less than ttl seconds ago
+        :param containers: Group and Role objects
+        :param nested: also read the members of member groups
+        """
+        pending = deque(containers)
+        queued = {container.id for container in pending}
+        running = {}
+        reads = 0
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            while pending or running:
+                while pending and len(running) < self._max_workers:
+                    container = pending.popleft()
+                    if self._is_fresh(container.id):
+                        members = self._members[container.id][1]
+                    else:
+                        running[pool.submit(self._read_members, container)] = container
+                        continue
+                    for group in members.groups if nested else []:
+                        if group.id not in queued:
+                            queued.add(group.id)
+                            pending.append(group)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    container = running.pop(future)
+                    try:
+                        members = future.result()
+                    except (RestServiceException, KeyError) as exc:
+                        self._logger.error('Failed to read members of %s: %s',
+                                           container.defaultName, exc)
+                        continue
+                    reads += 1
+                    with self._lock:
+                        self._set_members(container, members)
+                    for group in members.groups if nested else []:
+                        if group.id not in queued:
+                            queued.add(group.id)
+                            pending.append(group)
+        with self._lock:
+            self._up_closure.clear()
+            self._down_closure.clear()
+        self._logger.info('Read members of %d groups and roles', reads)
+        cycles = self.find_cycles()
+        if cycles:
+            self._logger.warning('Found %d membership cycles: %s', len(cycles),
+                                 [[self._objects[node].defaultName for node in cycle]
+                                  for cycle in cycles])
+
+    def direct_memberships(self) -> List[tuple]:
+        """ (group or role, direct Members) of every group and role read"""
+        with self._lock:
+            return [(self._objects[container_id], members)
+                    for container_id, (_, members) in self._members.items()]
+
+    def _closure(self, start: str, edges, cache: Dict[str, Set[str]]) -> Set[str]:
+        """ all the nodes reachable from start, cycles are visited once"""
+        with self._lock:
+            if start in cache:
+                return cache[start]
+            reached = set()
+            pending = deque([start])
+            while pending:
+                for node in edges(pending.popleft()):
+                    if node not in reached:
+                        reached.add(node)
+                        pending.append(node)
+            reached.discard(start)
+            cache[start] = reached
+            return reached
+
+    def _children(self, container_id: str) -> List[str]:
+        entry = self._members.get(container_id)
+        if entry is None:
+            return []
+        return [member.id for member in entry[1].users + entry[1].groups]
+
+    def effective_containers(self, member: Object) -> List[Object]:
+        """ all groups and roles the user (or group) belongs to, directly or through nesting"""
+        reached = self._closure(member.id, lambda node: self._parents.get(node, ()),
+                                self._up_closure)
+        return [self._objects[node] for node in reached]
+
+    def effective_roles(self, member: Object) -> List[Role]:
+        """ all roles the user (or group) belongs to, directly or through nesting"""
+        return [container for container in self.effective_containers(member)
+                if isinstance(container, Role)]
+
+    def transitive_members(self, container: Object) -> Members:
+        """ all users and groups of the group or role, including the members of nested groups
+        """
+        reached = self._closure(container.id, self._children, self._down_closure)
+        users = []
+        groups = []
+        for node in reached:
+            if isinstance(self._objects[node], User):
+                users.append(self._objects[node])
+            else:
+                groups.append(self._objects[node])
+        return Members(users=users, groups=groups)
+
+    def find_cycles(self) -> List[List[str]]:
+        """ groups nested in themselves, as lists of ids along the cycle"""
+        cycles = []
+        state = {}
+        with self._lock:
+            for root in list(self._members):
+                if root in state:
+                    continue
+                # iterative depth first search, 1 = on the current path, 2 = done
+                path = [root]
+                iterators = [iter(self._children(root))]
+                state[root] = 1
+                while iterators:
+                    node = next(iterators[-1], None)
+                    if node is None:
+                        state[path.pop()] = 2
+                        iterators.pop()
+                    elif state.get(node) == 1:
+                        cycles.append(path[path.index(node):])
+                    elif node not in state and node in self._members:
+                        state[node] = 1
+                        path.append(node)
+                        iterators.append(iter(self._children(node)))
+        return cycles
@@ -0,0 +1,148 @@
+"""Declarative group / role membership sync
+Reads the current members of many groups and roles concurrently, computes the minimal
+set of additions and removals to reach the desired members and writes only those:
+additions in batched POSTs, removals (one DELETE per member) in parallel
+"""
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+
+from exceptions.rest_service_exception import RestServiceException
+from services.groups import GroupsService
+from services.roles import RolesService
+from objects.object import Object
+from objects.role import Role
+from objects.members import Members
+from objects.membership_change import MembershipChange
+
+
+class MembershipReconciler:
+    """ Make groups and roles have exactly the desired members
+    usage:
+        reconciler = MembershipReconciler(groups=ca_service.groups, roles=ca_service.roles)
+        changes = reconciler.reconcile([(group, Members(users=[...], groups=[])),
+                                        (role, Members(users=[], groups=[group]))],
+                                       dry_run=True)
+    Members are compared by id, the order does not matter.
+    """
+
+    def __init__(self,
+                 groups: GroupsService,
+                 roles: RolesService,
+                 max_workers: int = 8,
+                 batch_size: int = 100,
+                 logger: logging.Logger = None):
+        """
+        :param groups: GroupsService to read and write group members with
+        :param roles: RolesService to read and write role members with
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        :param batch_size: members added per POST
+        """
+        self._groups = groups
+        self._roles = roles
+        self._max_workers = max_workers
+        self._batch_size = batch_size
+        self._logger = logger or logging.getLogger(__name__)
+
+    def _read_members(self, container: Object) -> Members:
+        if isinstance(container, Role):
+            return self._roles.get_role_members(role=container)
+        return self._groups.get_group_members(group=container)
+
+    def _add(self, container: Object, users: List[Object], groups: List[Object]) -> bool:
+        if isinstance(container, Role):
+            return self._roles.add_role_members(role=container, groups_to_add=groups,
+                                                users_to_add=users)
+        return self._groups.add_group_members(group=container, groups_to_add=groups,
+                                              users_to_add=users)
+
+    def _remove(self, container: Object, member: Object, member_type: str) -> bool:
+        if isinstance(container, Role):
+            return self._roles.remove_role_member(role=container, member=member,
+                                                  member_type=member_type)
+        return self._groups.remove_group_member(group=container, member=member,
+                                                member_type=member_type)
+
+    @staticmethod
+    def diff(container: Object, current: Members, desired: Members) -> MembershipChange:
+        """ additions and removals turning the current members into the desired ones"""
+        def missing(members: List[Object], other: List[Object]) -> List[Object]:
+            other_ids = {member.id for member in other}
+            return list({member.id: member for member in members
+                         if member.id not in other_ids}.values())
+        return MembershipChange(container=container,
+                                users_to_add=missing(desired.users, current.users),
+                                groups_to_add=missing(desired.groups, current.groups),
+                                users_to_remove=missing(current.users, desired.users),
+                                groups_to_remove=missing(current.groups, desired.groups))
+
+    def plan(self, desired: Iterable[Tuple[Object, Members]]) -> List[MembershipChange]:
+        """ read the current members concurrently and compute the changes, writing nothing
+        :param desired: (Group or Role, desired Members) pairs
+        :return: change per container, failed if the members could not be read
+        """
+        def read(item: Tuple[Object, Members]) -> MembershipChange:
+            container, members = item
+            try:
+                return self.diff(container, self._read_members(container), members)
+            except (RestServiceException, KeyError) as exc:
+                self._logger.error('Failed to read members of %s: %s',
+                                   container.defaultName, exc)
+                return MembershipChange(container=container, status='failed', error=str(exc))
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            return list(pool.map(read, desired))
+
+    def _writes(self, change: MembershipChange) -> list:
+        """ (function, args) of the requests applying a change"""
+        writes = []
+        users, groups = change.users_to_add, change.groups_to_add
+        for start in range(0, len(users) + len(groups), self._batch_size):
+            # batches fill up with users first, then groups
+            end = start + self._batch_size
+            writes.append((self._add, (change.container, users[start:end],
+                                       groups[max(0, start - len(users)):
+                                              max(0, end - len(users))])))
+        writes.extend((self._remove, (change.container, user, 'user'))
+                      for user in change.users_to_remove)
+        writes.extend((self._remove, (change.container, group, 'group'))
+                      for group in change.groups_to_remove)
+        return writes
+
+    def reconcile(self,
+                  desired: Iterable[Tuple[Object, Members]],
+                  dry_run: bool = False) -> List[MembershipChange]:
+        """ make the groups and roles have the desired members, changing only the differences
+        :param desired: (Group or Role, desired Members) pairs
+        :param dry_run: only compute the changes, reported as planned
+        :return: change per container with status unchanged, planned, applied or failed
+        """
+        changes = self.plan(desired)
+        pending = [change for change in changes if change.status != 'failed']
+        for change in pending:
+            if not change.is_empty():
+                change.status = 'planned'
+        if not dry_run:
+            writes = [(change, func, args) for change in pending
+                      for func, args in self._writes(change)]
+            def write(item) -> bool:
+                _, func, args = item
+                try:
+                    return func(*args)
+                except RestServiceException as exc:
+                    self._logger.error('Membership change failed: %s', exc)
+                    return False
+            with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+                for (change, _, _), succeeded in zip(writes, pool.map(write, writes)):
+                    if not succeeded:
+                        change.failed_writes += 1
+            for change in pending:
+                if change.status == 'planned':
+                    change.status = 'failed' if change.failed_writes else 'applied'
+                    if change.failed_writes:
+                        change.error = f'{change.failed_writes} membership writes failed'
+        counts = Counter(change.status for change in changes)
+        self._logger.info('Membership sync of %d groups and roles%s: %s', len(changes),
+                          ' (dry run)' if dry_run else '', dict(counts))
+        return changes
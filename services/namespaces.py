@@ -4,9 +4,14 @@ done via looking at what calls Cognos Analytics UI does when navigating the `Acc
 Need to be logged in via report_data.login method to get the X-XSRF-Token set up
 """
 import logging
-from dataclasses import fields
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator
 from services.rest import RestService
+from services.pagination import iter_pages, page_params
+from exceptions.rest_service_exception import RestServiceException
 from objects.namespace_object import NamespaceObject
+from objects.namespace_snapshot import NamespaceSnapshot
 
 
 class NamespacesService:
@@ -22,16 +27,68 @@ class NamespacesService:
     def get_list_of_namespaces(self) -> [NamespaceObject]:
         """ Return the list of configured namespaces"""
         response = self._ca_rest.get(endpoint=f'{self._base_endpoint}')
-        # filter the class init for the attributes defined in dataclass
-        return [NamespaceObject(
-            **{k:v for k,v in obj.items() if k in set(f.name for f in fields(NamespaceObject))})
-            for obj in response.data['data']]
+        return [NamespaceObject.from_dict(obj) for obj in response.data['data']]
 
     def get_namespace_items(self, namespace_object: NamespaceObject) -> [NamespaceObject]:
         """ Get namespace object items"""
-        response = self._ca_rest.get(
-            endpoint=f'{self._base_endpoint}/{namespace_object.id}/items')
-        # filter the class init for the attributes defined in dataclass
-        return [NamespaceObject(
-            **{k:v for k,v in obj.items() if k in set(f.name for f in fields(NamespaceObject))})
-            for obj in response.data['data']]
+        return list(self.iter_namespace_items(namespace_object=namespace_object))
+
+    def iter_namespace_items(self,
+                             namespace_object: NamespaceObject,
+                             page_size: int = None,
+                             prefetch: bool = True) -> Iterator[NamespaceObject]:
+        """ Lazily list namespace object items,
+        paging with page_size items per request if set, see pagination.iter_pages
+        """
+        def fetch_page(offset, limit):
+            response = self._ca_rest.get(
+                endpoint=f'{self._base_endpoint}/{namespace_object.id}/items',
+                params=page_params(None, offset, limit))
+            return response.data['data']
+        return (NamespaceObject.from_dict(obj)
+                for obj in iter_pages(fetch_page, page_size, prefetch))
+
+    def get_namespace_snapshot(self,
+                               namespace_object: NamespaceObject,
+                               max_workers: int = 8) -> NamespaceSnapshot:
+        """ Crawl the whole namespace (folders, groups, roles, users),
+        expanding only the objects that have children, up to max_workers listings at once.
+        Objects whose children could not be read are kept in snapshot.failed with the error,
+        check snapshot.complete before treating a missing object as gone
+        :param namespace_object: namespace or namespace folder to start from
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        """
+        snapshot = NamespaceSnapshot(root_id=namespace_object.id)
+        pending = deque([namespace_object])
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or running:
+                while pending and len(running) < max_workers:
+                    parent = pending.popleft()
+                    running[pool.submit(self.get_namespace_items, namespace_object=parent)] = \
+                        parent
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    parent = running.pop(future)
+                    try:
+                        items = future.result()
+                    except (RestServiceException, KeyError) as exc:
+                        self._logger.error('Failed to read namespace items of %s: %s',
+                                           parent.id, exc)
+                        snapshot.failed[parent.id] = str(exc)
+                        continue
+                    for obj in items:
+                        # the same object can show up under several parents
+                        if obj.id in snapshot.objects:
+                            snapshot.children.setdefault(parent.id, []).append(obj.id)
+                            continue
+                        snapshot.add(parent_id=parent.id, obj=obj)
+                        if obj.hasChildren:
+                            pending.append(obj)
+        if snapshot.failed:
+            self._logger.warning('Namespace %s snapshot is incomplete, failed to read %d objects',
+                                 namespace_object.id, len(snapshot.failed))
+        self._logger.info('Read %d objects from namespace %s',
+                          len(snapshot), namespace_object.id)
+        return snapshot
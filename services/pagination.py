@@ -0,0 +1,91 @@
+"""Lazy paging over list endpoints"""
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List
+
+# request parameters of a page
+OFFSET_PARAM = 'offset'
+LIMIT_PARAM = 'limit'
+
+
+def page_params(params: dict, offset: int, limit: int) -> dict:
+    """ request parameters with the paging ones added, if paging"""
+    if limit is None:
+        return params
+    return dict(params or {}, **{OFFSET_PARAM: offset, LIMIT_PARAM: limit})
+
+
+def _ignores_paging(page: list, previous: list, page_size: int) -> bool:
+    """ a page longer than requested or the same as the one before
+    means the endpoint does not honor offset and limit
+    """
+    if len(page) > page_size or (previous is not None and page and page == previous):
+        logging.getLogger(__name__).warning(
+            'List endpoint ignored %s/%s, reading the whole list instead',
+            OFFSET_PARAM, LIMIT_PARAM)
+        return True
+    return False
+
+
+def _unpaged_rest(fetch_page: Callable[[int, int], List[dict]],
+                  page: list,
+                  offset: int) -> Iterator[dict]:
+    """ the items after the offset already yielded, once paging turned out to be ignored:
+    a first page longer than page_size is already the whole list,
+    otherwise the whole list is read again
+    """
+    if offset == 0:
+        return iter(page)
+    return itertools.islice(fetch_page(None, None), offset, None)
+
+
+def iter_pages(fetch_page: Callable[[int, int], List[dict]],
+               page_size: int = None,
+               prefetch: bool = True) -> Iterator[dict]:
+    """ yield the items of a list endpoint page by page
+    :param fetch_page: reads the items at (offset, limit), both None for the whole list
+    :param page_size: items per request, None reads the whole list with one request
+    :param prefetch: read the next page in the background while the current one is consumed
+    a page shorter than page_size is the last one, closing the generator stops the paging.
+    Only use page_size with endpoints that honor offset and limit: a page longer
+    than page_size or the same as the one before means the endpoint ignores them,
+    the rest of the items is then read from the whole list, so such endpoints
+    neither page forever nor return part of the list
+    """
+    if not page_size:
+        yield from fetch_page(None, None)
+        return
+    if not prefetch:
+        offset = 0
+        previous = None
+        while True:
+            page = fetch_page(offset, page_size)
+            if _ignores_paging(page, previous, page_size):
+                yield from _unpaged_rest(fetch_page, page, offset)
+                return
+            offset += len(page)
+            yield from page
+            if len(page) < page_size:
+                return
+            previous = page
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ca_page')
+    offset = 0
+    previous = None
+    future = executor.submit(fetch_page, offset, page_size)
+    try:
+        while future is not None:
+            page = future.result()
+            future = None
+            if _ignores_paging(page, previous, page_size):
+                yield from _unpaged_rest(fetch_page, page, offset)
+                return
+            offset += len(page)
+            if len(page) == page_size:
+                future = executor.submit(fetch_page, offset, page_size)
+            yield from page
+            previous = page
+    finally:
+        if future is not None:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,216 @@
+"""Client side rate limiting for RestService
+Token bucket plus concurrency limit per endpoint class, adapting down (multiplicatively)
+when the server answers 429 / 5xx or its latency grows, and back up (additively) while it is healthy.
+Share one RateLimiter between all services and sessions talking to the same gateway.
+Patterns are matched against the endpoint after the ca_url, e.g. /v1/disp/rds/reportData/...
+A streamed response (RestService.stream) holds its slot until it is read or closed.
+usage:
+    limiter = RateLimiter({'/v1/disp/rds/*': EndpointLimit(rate=2, max_concurrency=4),
+                           '/api/v1/*': EndpointLimit(rate=50, max_concurrency=16)})
+    ca_service = CognosAnalyticsService(ca_url=..., rate_limiter=limiter)
+"""
+import logging
+import threading
+import time
+import weakref
+from fnmatch import fnmatchcase
+from typing import Dict, Optional
+
+import requests
+
+
+class EndpointLimit:
+    """ Rate and concurrency limit of one endpoint class, adapted to the server's health"""
+
+    def __init__(self,
+                 rate: float = 20,
+                 max_concurrency: int = 8,
+                 burst: float = None,
+                 min_rate: float = 0.5,
+                 min_concurrency: int = 1,
+                 increase: float = 1,
+                 decrease: float = 0.5,
+                 latency_factor: float = 3,
+                 cooldown: float = 2,
+                 name: str = '',
+                 logger: logging.Logger = None):
+        """
+        :param rate: highest requests per second
+        :param max_concurrency: highest number of requests in flight
+        :param burst: requests that can be sent at once after a quiet period, rate by default
+        :param min_rate: requests per second never to go below when backing off
+        :param min_concurrency: requests in flight never to go below when backing off
+        :param increase: requests per second regained per second of healthy responses
+        :param decrease: factor applied to the rate and concurrency on overload
+        :param latency_factor: smoothed latency above this multiple of the baseline
+            counts as overload, None to only react to 429 / 5xx
+            (e.g. for reports whose run time varies a lot)
+        :param cooldown: seconds between two decreases, so one burst of errors backs off once
+        :param name: name in the log messages
+        """
+        self._logger = logger or logging.getLogger(__name__)
+        self.name = name
+        self._max_rate = rate
+        self._min_rate = min(min_rate, rate)
+        self._burst = burst or max(1.0, rate)
+        self._max_concurrency = max_concurrency
+        self._min_concurrency = min(min_concurrency, max_concurrency)
+        self._increase = increase
+        self._decrease = decrease
+        self._latency_factor = latency_factor
+        self._cooldown = cooldown
+        self.rate = float(rate)
+        self.concurrency = max_concurrency
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._successes = 0
+        self._latency = None
+        self._baseline = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        """requests currently sent"""
+        return self._in_flight
+
+    def _refill(self, now: float):
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """ wait for a free slot and a token before sending a request"""
+        with self._condition:
+            while self._in_flight >= self.concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+            self._refill(time.monotonic())
+            # reserve the token, waiting for it outside of the lock if the bucket is empty
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def release(self, status_code: Optional[int], latency: float, free_slot: bool = True):
+        """ a request acquired before completed
+        :param status_code: status of the response, None if there was no response
+        :param latency: seconds the request took
+        :param free_slot: False to keep the concurrency slot until free_slot() is called,
+            e.g. while the body of a streamed response is read
+        """
+        with self._condition:
+            if free_slot:
+                self._in_flight -= 1
+            overloaded = status_code is None or status_code == 429 or status_code >= 500
+            if not overloaded:
+                self._latency = latency if self._latency is None \
+                    else 0.8 * self._latency + 0.2 * latency
+                # lowest latency seen, drifting up slowly so the baseline follows slow trends
+                self._baseline = latency if self._baseline is None \
+                    else min(latency, self._baseline * 1.01)
+                overloaded = self._latency_factor is not None and \
+                    self._latency > self._latency_factor * self._baseline
+            if overloaded:
+                self._back_off(status_code)
+            else:
+                self._speed_up()
+            self._condition.notify_all()
+
+    def free_slot(self):
+        """ give back the concurrency slot kept by release(free_slot=False)"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def hold(self, response: requests.Response):
+        """ keep the concurrency slot of a streamed response until its body is read,
+        it is closed or it is garbage collected
+        """
+        freed = threading.Lock()
+
+        def free():
+            if freed.acquire(blocking=False):
+                self.free_slot()
+
+        close = response.close
+        iter_content = response.iter_content
+
+        def closing():
+            try:
+                close()
+            finally:
+                free()
+
+        def reading(*args, **kwargs):
+            yield from iter_content(*args, **kwargs)
+            free()
+
+        response.close = closing
+        response.iter_content = reading
+        weakref.finalize(response, free)
+
+    def _back_off(self, status_code: Optional[int]):
+        now = time.monotonic()
+        if now - self._last_decrease < self._cooldown:
+            return
+        self._last_decrease = now
+        self._refill(now)
+        self.rate = max(self._min_rate, self.rate * self._decrease)
+        self.concurrency = max(self._min_concurrency, int(self.concurrency * self._decrease))
+        self._successes = 0
+        # start the latency tracking over at the lower load
+        self._latency = self._baseline = None
+        self._logger.warning('Backing off %s to %.1f requests/s, %d in flight (%s)',
+                             self.name or 'requests', self.rate, self.concurrency,
+                             'latency growth' if status_code is not None and status_code < 500
+                             and status_code != 429 else f'status {status_code}')
+
+    def _speed_up(self):
+        if self.rate < self._max_rate:
+            self._refill(time.monotonic())
+            # about `increase` requests per second more for every second at the current rate
+            self.rate = min(self._max_rate, self.rate + self._increase / self.rate)
+        if self.concurrency < self._max_concurrency:
+            self._successes += 1
+            # one more slot after a full round of successful requests
+            if self._successes >= self.concurrency:
+                self._successes = 0
+                self.concurrency += 1
+
+
+class RateLimiter:
+    """ EndpointLimits by endpoint pattern, shared across services"""
+
+    def __init__(self,
+                 limits: Dict[str, EndpointLimit] = None,
+                 default: EndpointLimit = None):
+        """
+        :param limits: EndpointLimit by endpoint pattern (fnmatch style),
+            first matching pattern wins
+        :param default: (optional) EndpointLimit of the other endpoints,
+            they are not limited if not set
+        """
+        self._limits = limits or {}
+        self._default = default
+        for pattern, limit in self._limits.items():
+            limit.name = limit.name or pattern
+        if default is not None:
+            default.name = default.name or 'default'
+
+    def limit(self, endpoint: str) -> Optional[EndpointLimit]:
+        """EndpointLimit of the endpoint, None if it is not limited"""
+        path = endpoint.split('?', 1)[0]
+        for pattern, limit in self._limits.items():
+            if fnmatchcase(path, pattern):
+                return limit
+        return self._default
+
+    def status(self) -> Dict[str, dict]:
+        """current rate, concurrency and requests in flight per endpoint class"""
+        limits = list(self._limits.values())
+        if self._default is not None:
+            limits.append(self._default)
+        return {limit.name: {'rate': limit.rate,
+                             'concurrency': limit.concurrency,
+                             'in_flight': limit.in_flight} for limit in limits}
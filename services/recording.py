@@ -0,0 +1,239 @@
+"""Record and replay the HTTP traffic of a RestService
+Recordings are JSON lines, one exchange per line (gzip compressed if the file name ends with .gz),
+with method, endpoint, params, status, response headers and body and the time the server took.
+Request headers and bodies are not stored, credentials passed as params (e.g. xmlData of the
+rds logon) are redacted, but response bodies (e.g. session keys) are stored as they are.
+usage:
+    recorder = record(ca_service_rest, 'nightly_job.jsonl.gz')
+    ... run the job ...
+    recorder.close()
+
+    replayer = replay(RestService(ca_url='http://replay'), 'nightly_job.jsonl.gz', time_scale=0)
+Mount after set_pool_maxsize (e.g. after creating an AsyncRestService),
+which mounts new adapters.
+"""
+import base64
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.cookies import SimpleCookie
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# params whose values are not written to recordings
+REDACTED_PARAMS = ('xmlData', 'CAMPassword', 'password')
+# response headers worth keeping
+RECORDED_HEADERS = ('Content-Type', 'Content-Length', 'ETag', 'Last-Modified',
+                    'Retry-After', 'Set-Cookie', 'Location')
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _request_key(method: str, path: str, query: str) -> Tuple[str, str, str]:
+    """match key of a request, the params in a stable order"""
+    return method, path, urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def load_recording(path: str) -> Iterator[dict]:
+    """ the exchanges of a recording, in the order they completed"""
+    with _open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RecordingAdapter(BaseAdapter):
+    """ Transport adapter passing the requests to the adapter it replaces
+    and writing every exchange to a recording
+    """
+
+    def __init__(self,
+                 inner: BaseAdapter,
+                 path: str,
+                 base_url: str = '',
+                 redacted_params: Iterable[str] = REDACTED_PARAMS):
+        """
+        :param inner: adapter that sends the requests
+        :param path: recording file, .gz to compress it
+        :param base_url: ca_url of the RestService, removed from the recorded endpoints
+        :param redacted_params: params whose values are replaced with ***
+        """
+        super().__init__()
+        self._inner = inner
+        self._base_path = urlsplit(base_url).path.rstrip('/')
+        self._redacted = set(redacted_params)
+        self._file = _open(path, 'w')
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self.count = 0
+
+    def _query(self, query: str) -> str:
+        return urlencode([(key, '***' if key in self._redacted else value)
+                          for key, value in parse_qsl(query, keep_blank_values=True)])
+
+    def send(self, request, **kwargs):
+        """ send with the inner adapter, reading the whole body to record it"""
+        start = time.monotonic()
+        response = self._inner.send(request, **kwargs)
+        # reads the body even for streamed requests, iter_content serves it from memory
+        body = response.content
+        elapsed = time.monotonic() - start
+        url = urlsplit(request.url)
+        path = url.path
+        if self._base_path and path.startswith(self._base_path):
+            path = path[len(self._base_path):]
+        exchange = {
+            't': round(start - self._start, 6),
+            'elapsed': round(elapsed, 6),
+            'method': request.method,
+            'endpoint': path,
+            'params': self._query(url.query),
+            'request_bytes': len(request.body or b''),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {key: response.headers[key] for key in RECORDED_HEADERS
+                        if key in response.headers},
+        }
+        try:
+            exchange['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            exchange['body_b64'] = base64.b64encode(body).decode('ascii')
+        line = json.dumps(exchange, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self.count += 1
+        return response
+
+    def close(self):
+        """ close the inner adapter and the recording"""
+        self._inner.close()
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """ Transport adapter answering the requests from a recording instead of a server
+    Requests are matched on method, endpoint and params, repeated requests get the
+    recorded responses in order (the last one again when they run out).
+    Requests missing from the recording are matched on method and endpoint only,
+    and get a 404 if that fails too.
+    """
+
+    def __init__(self,
+                 path: str,
+                 base_url: str = '',
+                 time_scale: float = 1.0,
+                 set_cookie: Callable[[str, str], None] = None,
+                 logger: logging.Logger = None):
+        """
+        :param path: recording file
+        :param base_url: ca_url of the RestService, removed from the request paths
+        :param time_scale: multiplier of the recorded server time, 1 preserves it,
+            0 answers at once
+        :param set_cookie: (optional) called with the name and value of every recorded cookie,
+            e.g. RestService.add_cookie
+        """
+        super().__init__()
+        self._logger = logger or logging.getLogger(__name__)
+        self._base_path = urlsplit(base_url).path.rstrip('/')
+        self._time_scale = time_scale
+        self._set_cookie = set_cookie
+        self._exact: Dict[Tuple, deque] = {}
+        self._by_endpoint: Dict[Tuple, deque] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        for exchange in load_recording(path):
+            self._exact.setdefault(
+                _request_key(exchange['method'], exchange['endpoint'], exchange['params']),
+                deque()).append(exchange)
+            self._by_endpoint.setdefault(
+                (exchange['method'], exchange['endpoint']), deque()).append(exchange)
+
+    def _next(self, queue: deque) -> dict:
+        """next recorded exchange, keeping the last one for further repeats"""
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def _find(self, method: str, path: str, query: str) -> dict:
+        with self._lock:
+            queue = self._exact.get(_request_key(method, path, query))
+            if not queue:
+                queue = self._by_endpoint.get((method, path))
+            if not queue:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._next(queue)
+
+    def _set_cookies(self, header: str):
+        cookie = SimpleCookie()
+        cookie.load(header)
+        for name, morsel in cookie.items():
+            self._set_cookie(name, morsel.value)
+
+    def send(self, request, **kwargs):
+        """ answer from the recording, waiting time_scale times the recorded server time"""
+        url = urlsplit(request.url)
+        path = url.path
+        if self._base_path and path.startswith(self._base_path):
+            path = path[len(self._base_path):]
+        exchange = self._find(request.method, path, url.query)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if exchange is None:
+            self._logger.warning('%s %s is not in the recording', request.method, path)
+            response.status_code = 404
+            response.reason = 'Not Found'
+            response.raw = BytesIO(b'')
+            return response
+        if self._time_scale and exchange['elapsed']:
+            time.sleep(exchange['elapsed'] * self._time_scale)
+        body = exchange['body'].encode('utf-8') if 'body' in exchange \
+            else base64.b64decode(exchange.get('body_b64', ''))
+        response.status_code = exchange['status']
+        response.reason = exchange['reason']
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        response.headers['Content-Length'] = str(len(body))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = BytesIO(body)
+        if self._set_cookie is not None and 'Set-Cookie' in response.headers:
+            self._set_cookies(response.headers['Set-Cookie'])
+        return response
+
+    def close(self):
+        """nothing to release"""
+
+
+def record(rest, path: str, **kwargs) -> RecordingAdapter:
+    """ start recording the traffic of a RestService, close() the returned adapter to finish
+    :param kwargs: RecordingAdapter arguments, e.g. redacted_params
+    """
+    adapter = RecordingAdapter(rest.get_adapter(), path, base_url=rest.url, **kwargs)
+    rest.mount(adapter)
+    return adapter
+
+
+def replay(rest, path: str, time_scale: float = 1.0, **kwargs) -> ReplayAdapter:
+    """ answer the requests of a RestService from a recording
+    :param time_scale: multiplier of the recorded server time, 0 answers at once
+    :param kwargs: ReplayAdapter arguments
+    """
+    adapter = ReplayAdapter(path, base_url=rest.url, time_scale=time_scale,
+                            set_cookie=rest.add_cookie, **kwargs)
+    rest.mount(adapter)
+    return adapter
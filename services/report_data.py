@@ -1,9 +1,217 @@
 """Cognos Mashup Services 
 https://www.ibm.com/docs/en/cognos-analytics/11.2.0?topic=developer-developing-mashup-service-applications-using-rest-interface
 """
+import codecs
+import json
 import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator
+import requests
 from services.rest import RestService
+from exceptions.rest_service_exception import RestServiceException
+from objects.columnar_dataset import ColumnarDataSet
 
+# start of the rows array of a DataSetJSON dataTable
+_ROW_ARRAY_START = re.compile(r'"row"\s*:\s*\[')
+_WHITESPACE = ' \t\n\r,'
+# conversation id of an asynchronous request, in JSON or XML status responses
+_CONVERSATION_ID = re.compile(r'conversationID\W*([\w.\-]+)')
+# ISO dates & timestamps that numpy can parse into datetime64
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+
+def iter_dataset_rows(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """ Incrementally parse DataSetJSON from chunks of bytes, yielding one row dict at a time
+    only the current row and the unparsed tail of the last chunk are kept in memory
+    rows of all dataTables in the output are returned one after another
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    in_rows = False
+    for chunk in chunks:
+        buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+        while True:
+            if not in_rows:
+                match = _ROW_ARRAY_START.search(buffer, pos)
+                if match is None:
+                    # keep enough of the tail for a split '"row" : [' marker
+                    pos = max(pos, len(buffer) - 32)
+                    break
+                pos = match.end()
+                in_rows = True
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                pos += 1
+                in_rows = False
+                continue
+            try:
+                row, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # row is split between chunks
+                break
+            yield row
+    if in_rows:
+        raise ValueError('DataSetJSON output ended in the middle of the rows')
+
+
+
+class ColumnarDataSetBuilder:
+    """ Build a ColumnarDataSet from batches of DataSetJSON rows,
+    converting each batch to typed NumPy arrays so the row dicts can be released.
+    Column types are inferred from the values: int, float, bool, ISO dates and strings,
+    strings are dictionary encoded across batches, empty values of bool columns are masked
+    """
+
+    def __init__(self):
+        import numpy as np
+        self._np = np
+        self._rows = 0
+        self._kinds = {}
+        self._parts = {}
+        self._nulls = {}
+        self._dictionaries = {}
+        # empty value masks of the bool column parts
+        self._masks = {}
+        # dictionary codes of the source strings of the datetime column parts,
+        # so a column that turns out to be text keeps its values as they were
+        self._sources = {}
+
+    def _kind(self, value) -> str:
+        if isinstance(value, bool):
+            return 'bool'
+        if isinstance(value, int):
+            return 'int'
+        if isinstance(value, float):
+            return 'float'
+        if isinstance(value, str) and _ISO_DATE.match(value):
+            return 'datetime'
+        return 'string'
+
+    def _encode(self, name: str, values: list):
+        index = self._dictionaries.setdefault(name, {})
+        return self._np.fromiter(
+            (-1 if value is None else index.setdefault(str(value), len(index))
+             for value in values),
+            dtype=self._np.int32, count=len(values))
+
+    def _check(self, kind: str, values: list):
+        """ raise TypeError if a value does not fit the column type,
+        numpy would otherwise cast it silently (e.g. 99.5 to 99 or 'False' to True)
+        """
+        if kind == 'string':
+            return
+        if kind == 'datetime':
+            fits = (value is None or isinstance(value, str) and _ISO_DATE.match(value)
+                    for value in values)
+        elif kind == 'float':
+            fits = (value is None or isinstance(value, (int, float))
+                    and not isinstance(value, bool) for value in values)
+        elif kind == 'int':
+            fits = (isinstance(value, int) and not isinstance(value, bool)
+                    for value in values)
+        else:
+            fits = (value is None or isinstance(value, bool) for value in values)
+        if not all(fits):
+            raise TypeError(f'values that are not {kind} in a {kind} column')
+
+    def _convert(self, name: str, kind: str, values: list):
+        np = self._np
+        self._check(kind, values)
+        if kind == 'int':
+            return np.array(values, dtype=np.int64)
+        if kind == 'float':
+            return np.array(values, dtype=np.float64)
+        if kind == 'bool':
+            mask = np.fromiter((value is None for value in values), dtype=np.bool_,
+                               count=len(values))
+            part = np.fromiter((value is True for value in values), dtype=np.bool_,
+                               count=len(values))
+            self._masks.setdefault(name, []).append(mask)
+            return part
+        if kind == 'datetime':
+            part = np.array(values, dtype='datetime64[ms]')
+            self._sources.setdefault(name, []).append(self._encode(name, values))
+            return part
+        return self._encode(name, values)
+
+    def _promote(self, name: str, kind: str):
+        """ change the type of the already converted parts of a column"""
+        old_kind = self._kinds[name]
+        self._kinds[name] = kind
+        if kind == 'float':
+            self._parts[name] = [part.astype(self._np.float64) for part in self._parts[name]]
+        elif old_kind == 'datetime':
+            # already encoded in the dictionary of the column
+            self._parts[name] = self._sources.pop(name)
+        elif old_kind == 'bool':
+            self._parts[name] = [
+                self._encode(name, [None if empty else value
+                                    for value, empty in zip(part.tolist(), mask.tolist())])
+                for part, mask in zip(self._parts[name], self._masks.pop(name))]
+        else:
+            self._parts[name] = [self._encode(name, part.tolist())
+                                 for part in self._parts[name]]
+        logging.debug('Column %s changed type from %s to %s', name, old_kind, kind)
+
+    def add_rows(self, rows: [dict]):
+        """ convert a batch of rows and append it to the columns"""
+        if not rows:
+            return
+        names = dict.fromkeys(name for row in rows for name in row)
+        for name in names:
+            if name not in self._kinds and name not in self._nulls:
+                self._nulls[name] = self._rows
+        for name in list(self._nulls) + list(self._kinds):
+            values = [row.get(name) for row in rows]
+            kind = self._kinds.get(name)
+            if kind is None:
+                first = next((value for value in values if value is not None), None)
+                if first is None:
+                    self._nulls[name] += len(values)
+                    continue
+                kind = self._kind(first)
+                self._kinds[name] = kind
+                self._parts[name] = []
+                values = [None] * self._nulls.pop(name) + values
+            try:
+                part = self._convert(name, kind, values)
+            except (TypeError, ValueError, OverflowError):
+                # e.g. decimals, empty values or integers beyond int64 in an int column,
+                # text in a numeric one, ints only become floats, anything else a string
+                kind = 'float' if kind == 'int' else 'string'
+                try:
+                    part = self._convert(name, kind, values)
+                except (TypeError, ValueError, OverflowError):
+                    kind = 'string'
+                    part = self._convert(name, kind, values)
+                self._promote(name, kind)
+            self._parts[name].append(part)
+        self._rows += len(rows)
+
+    def build(self) -> ColumnarDataSet:
+        """ concatenate the converted batches"""
+        np = self._np
+        dataset = ColumnarDataSet()
+        for name, null_count in self._nulls.items():
+            dataset.columns[name] = np.full(null_count, np.nan)
+        for name, parts in self._parts.items():
+            dataset.columns[name] = np.concatenate(parts)
+            if self._kinds[name] == 'string':
+                dataset.dictionaries[name] = np.array(list(self._dictionaries[name]),
+                                                      dtype=object)
+            elif self._kinds[name] == 'bool':
+                mask = np.concatenate(self._masks[name])
+                if mask.any():
+                    dataset.masks[name] = mask
+        return dataset
 
 
 class ReportDataService:
@@ -53,21 +261,231 @@ class ReportDataService:
         else:
             logging.error('Failed to login into Cognos Mashup Services as %s\\%s',namespace,user)
 
+    def _report_params(self,
+                       async_mode: str,
+                       fmt: str,
+                       report_object: str = '',
+                       row_limit: int = 0,
+                       prompts: Dict = None) -> dict:
+        """ CMS request parameters, prompts are passed as p_<parameter name>=value"""
+        params = {'v': 3, 'async': async_mode, 'fmt': fmt}
+        if report_object != '':
+            params['selection'] = report_object
+        if row_limit != 0:
+            params['row_limit'] = row_limit
+        if prompts:
+            for name, value in prompts.items():
+                params[f'p_{name}'] = value
+        return params
+
     def run_report_sync(self, 
                         reportid:str,
                         report_object:str='',
                         fmt:str = 'DataSetJSON',
-                        row_limit:int = 0)-> dict :
+                        row_limit:int = 0,
+                        prompts: Dict = None)-> dict :
         """	run a report synchroniously and return the resulting dataset in JSON
+        :param prompts: (optional) prompt values by parameter name
         """
         logging.debug("Running Cognos report %s with the object %s ",reportid, report_object)
-        params = {'v':3, 'async':'OFF','fmt':fmt} 
-        if report_object != '':
-            params['selection'] = report_object
-        if row_limit != 0:
-            params['row_limit'] = row_limit
+        params = self._report_params('OFF', fmt, report_object, row_limit, prompts)
         response = self._ca_rest.post(
             endpoint=f'{self._base_endpoint}/reportData/report/{reportid}',params=params)
         if response.status_code == 200:
             return response.data
-    
\ No newline at end of file
+
+    def run_report_stream(self,
+                          reportid: str,
+                          report_object: str = '',
+                          row_limit: int = 0,
+                          batch_size: int = 0,
+                          chunk_size: int = 1024 * 1024,
+                          prompts: Dict = None) -> Iterator:
+        """	run a report synchroniously and stream the resulting DataSetJSON,
+        parsing the rows as the response body arrives
+        :param prompts: (optional) prompt values by parameter name
+        :param batch_size: yield lists of up to batch_size rows instead of single rows
+        :param chunk_size: number of bytes read from the response at once
+        """
+        logging.debug("Streaming Cognos report %s with the object %s ", reportid, report_object)
+        params = self._report_params('OFF', 'DataSetJSON', report_object, row_limit, prompts)
+        response = self._ca_rest.stream(
+            http_method='POST',
+            endpoint=f'{self._base_endpoint}/reportData/report/{reportid}', params=params)
+        try:
+            rows = iter_dataset_rows(response.iter_content(chunk_size=chunk_size))
+            if not batch_size:
+                yield from rows
+                return
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            response.close()
+    
+    def run_report_columnar(self,
+                            reportid: str,
+                            report_object: str = '',
+                            row_limit: int = 0,
+                            batch_size: int = 50000) -> ColumnarDataSet:
+        """	run a report and convert the DataSetJSON output to typed NumPy columns
+        as it streams in, use .to_arrow() or .to_pandas() on the result for a table
+        requires numpy (and pyarrow or pandas for the conversions)
+        """
+        builder = ColumnarDataSetBuilder()
+        for batch in self.run_report_stream(reportid=reportid,
+                                            report_object=report_object,
+                                            row_limit=row_limit,
+                                            batch_size=batch_size):
+            builder.add_rows(batch)
+        return builder.build()
+
+    def _conversation_id(self, data) -> str:
+        """ find the conversation id in the status returned for a running report"""
+        if isinstance(data, dict) and isinstance(data.get('data'), bytes):
+            text = data['data'].decode('utf-8', errors='replace')
+        else:
+            text = json.dumps(data)
+        match = _CONVERSATION_ID.search(text)
+        if match is None:
+            raise RestServiceException(f'No conversationID in the report status: {text[:200]}')
+        return match.group(1)
+
+    def run_report_async(self,
+                         reportid: str,
+                         report_object: str = '',
+                         fmt: str = 'DataSetJSON',
+                         row_limit: int = 0,
+                         poll_interval: float = 1,
+                         max_poll_interval: float = 30,
+                         backoff: float = 1.5,
+                         timeout: float = 3600,
+                         prompts: Dict = None) -> dict:
+        """	submit a report asynchronously and poll the conversation until the output is ready,
+        so no HTTP connection is held open for the whole run
+        https://www.ibm.com/docs/en/cognos-analytics/11.2.0?topic=requests-asynchronous
+        :param poll_interval: seconds before the first poll
+        :param max_poll_interval: upper limit of the wait between polls
+        :param backoff: multiplier of the wait between polls
+        :param timeout: seconds after which to give up on the report
+        :param prompts: (optional) prompt values by parameter name
+        """
+        logging.debug("Submitting Cognos report %s with the object %s ", reportid, report_object)
+        params = self._report_params('MANUAL', fmt, report_object, row_limit, prompts)
+        response = self._ca_rest.post(
+            endpoint=f'{self._base_endpoint}/reportData/report/{reportid}', params=params)
+        deadline = time.monotonic() + timeout
+        wait = poll_interval
+        while response.status_code == 202:
+            conversation_id = self._conversation_id(response.data)
+            if time.monotonic() + wait > deadline:
+                raise RestServiceException(
+                    f'Report {reportid} did not finish in {timeout} seconds')
+            time.sleep(wait)
+            wait = min(wait * backoff, max_poll_interval)
+            logging.debug("Polling Cognos report %s conversation %s", reportid, conversation_id)
+            response = self._ca_rest.get(
+                endpoint=f'{self._base_endpoint}/wait/conversationID/{conversation_id}',
+                params={'v': 3, 'async': 'MANUAL', 'fmt': fmt})
+        if response.status_code == 200:
+            return response.data
+        logging.error('Running report %s failed: %s', reportid, response.message)
+
+    def _run_partition(self,
+                       reportid: str,
+                       report_object: str,
+                       prompts: Dict,
+                       partition_column: str,
+                       value) -> [dict]:
+        """ read all rows of one partition, tagging them with the partition value"""
+        rows = list(self.run_report_stream(reportid=reportid,
+                                           report_object=report_object,
+                                           prompts=prompts))
+        if partition_column is not None:
+            for row in rows:
+                row[partition_column] = value
+        return rows
+
+    def run_report_partitioned(self,
+                               reportid: str,
+                               prompt_name: str,
+                               partition_values: Iterable,
+                               report_object: str = '',
+                               prompts: Dict = None,
+                               partition_column: str = None,
+                               max_workers: int = 4,
+                               retries: int = 2) -> Iterator[list]:
+        """	split a large report into one run per prompt value (e.g. per region or month),
+        run up to max_workers partitions at once and yield the rows of every partition
+        as a list, in the order the partitions finish.
+        Failed partitions are retried on their own, partitions that still fail are
+        reported with a RestServiceException once all the others are returned
+        :param prompt_name: parameter that selects the partition
+        :param partition_values: one report run per value
+        :param prompts: (optional) other prompt values, the same for all partitions
+        :param partition_column: (optional) add the partition value to every row as this column
+        :param max_workers: number of concurrent report runs,
+            keep within the pool_maxsize of the RestService
+        :param retries: number of times a failed partition is run again
+        """
+        attempts = {}
+        failed = []
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            def submit(value):
+                attempts[value] = attempts.get(value, 0) + 1
+                partition_prompts = dict(prompts or {}, **{prompt_name: value})
+                future = pool.submit(self._run_partition, reportid, report_object,
+                                     partition_prompts, partition_column, value)
+                running[future] = value
+
+            running = {}
+            for value in partition_values:
+                submit(value)
+            while running:
+                for future in as_completed(list(running)):
+                    value = running.pop(future)
+                    try:
+                        rows = future.result()
+                    except (RestServiceException, requests.exceptions.RequestException,
+                            ValueError) as exc:
+                        # incl. connections dropped while the rows stream in
+                        if attempts[value] <= retries:
+                            logging.warning('Partition %s=%s of report %s failed, retrying: %s',
+                                            prompt_name, value, reportid, exc)
+                            submit(value)
+                        else:
+                            logging.error('Partition %s=%s of report %s failed: %s',
+                                          prompt_name, value, reportid, exc)
+                            failed.append(value)
+                        continue
+                    logging.debug('Partition %s=%s of report %s returned %d rows',
+                                  prompt_name, value, reportid, len(rows))
+                    yield rows
+        finally:
+            # a closed generator does not wait for the partitions still queued or running
+            pool.shutdown(wait=False, cancel_futures=True)
+        if failed:
+            raise RestServiceException(
+                f'Partitions {prompt_name}={failed} of report {reportid} failed')
+
+    def run_report_partitioned_columnar(self,
+                                        reportid: str,
+                                        prompt_name: str,
+                                        partition_values: Iterable,
+                                        **kwargs) -> ColumnarDataSet:
+        """	run a report partitioned by prompt values (see run_report_partitioned)
+        and merge the partitions into one ColumnarDataSet
+        """
+        builder = ColumnarDataSetBuilder()
+        for rows in self.run_report_partitioned(reportid=reportid,
+                                                prompt_name=prompt_name,
+                                                partition_values=partition_values,
+                                                **kwargs):
+            builder.add_rows(rows)
+        return builder.build()
@@ -0,0 +1,90 @@
+"""Run many reports at once, with a concurrency cap per dispatcher and priorities"""
+import logging
+import queue
+import threading
+import time
+from itertools import count
+from typing import Callable, Dict, Iterable
+
+from exceptions.rest_service_exception import RestServiceException
+from services.report_data import ReportDataService
+from objects.report_job import ReportJob
+
+
+class ReportScheduler:
+    """ Runs ReportJobs asynchronously (submit & poll) across dispatchers
+    usage:
+        scheduler = ReportScheduler({'disp1': ca_service.report_data}, max_per_dispatcher=4)
+        jobs = scheduler.run([ReportJob(priority=0, reportid='i1234'), ...])
+    """
+
+    def __init__(self,
+                 dispatchers: Dict[str, ReportDataService],
+                 max_per_dispatcher: int = 4,
+                 on_complete: Callable[[ReportJob], None] = None,
+                 logger: logging.Logger = None,
+                 **run_options):
+        """
+        :param dispatchers: ReportDataService per dispatcher name,
+            each one with a RestService pointing to its dispatcher
+        :param max_per_dispatcher: number of reports running at once on every dispatcher
+        :param on_complete: (optional) called from the worker thread with every finished job
+        :param run_options: passed to ReportDataService.run_report_async,
+            e.g. poll_interval or timeout
+        """
+        self._dispatchers = dispatchers
+        self._max_per_dispatcher = max_per_dispatcher
+        self._on_complete = on_complete
+        self._run_options = run_options
+        self._logger = logger or logging.getLogger(__name__)
+
+    def _worker(self, name: str, service: ReportDataService, jobs: queue.PriorityQueue):
+        while True:
+            try:
+                _, _, job = jobs.get_nowait()
+            except queue.Empty:
+                return
+            job.dispatcher = name
+            job.status = 'running'
+            start = time.monotonic()
+            try:
+                job.result = service.run_report_async(reportid=job.reportid,
+                                                      report_object=job.report_object,
+                                                      fmt=job.fmt,
+                                                      row_limit=job.row_limit,
+                                                      prompts=job.prompts,
+                                                      **self._run_options)
+                job.status = 'failed' if job.result is None else 'done'
+            except RestServiceException as exc:
+                job.status = 'failed'
+                job.error = str(exc)
+            except Exception as exc:  # pylint: disable=broad-except
+                # e.g. a dropped connection, fail the job and keep the worker running
+                self._logger.exception('Report %s failed on %s', job.reportid, name)
+                job.status = 'failed'
+                job.error = f'{type(exc).__name__}: {exc}'
+            job.elapsed = time.monotonic() - start
+            self._logger.info('Report %s %s on %s in %.1fs',
+                              job.reportid, job.status, name, job.elapsed)
+            if self._on_complete is not None:
+                try:
+                    self._on_complete(job)
+                except Exception:  # pylint: disable=broad-except
+                    self._logger.exception('on_complete failed for report %s', job.reportid)
+
+    def run(self, jobs: Iterable[ReportJob]) -> [ReportJob]:
+        """ run all the jobs, highest priority (lowest value) first, and wait for them"""
+        jobs = list(jobs)
+        pending = queue.PriorityQueue()
+        # the counter keeps submission order among jobs of the same priority
+        for order, job in zip(count(), jobs):
+            pending.put((job.priority, order, job))
+        workers = [threading.Thread(target=self._worker, args=(name, service, pending),
+                                    name=f'report_{name}_{slot}', daemon=True)
+                   for name, service in self._dispatchers.items()
+                   for slot in range(self._max_per_dispatcher)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return jobs
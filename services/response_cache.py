@@ -0,0 +1,176 @@
+"""Cache of GET responses for RestService"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Dict, Optional, Tuple
+
+from objects.rest_response import RestResponse
+
+
+@dataclass
+class CacheEntry:
+    """
+    cached response with its expiry time and revalidation headers
+    """
+    endpoint: str
+    response: RestResponse
+    expires: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def validators(self) -> Dict[str, str]:
+        """headers for a conditional request"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """ LRU cache of GET responses keyed by endpoint and params,
+    with time to live per endpoint pattern.
+    Expired entries that came with ETag / Last-Modified are revalidated
+    with a conditional request instead of being dropped.
+    Responses are keyed by the session they were read with too,
+    so a cache shared between sessions does not give one user the responses of another.
+    usage:
+        rest = RestService(ca_url=..., cache=ResponseCache(
+            ttls={'/api/v1/groups/*': 600, '/v1/namespaces*': 3600}))
+    """
+
+    def __init__(self,
+                 max_size: int = 1000,
+                 default_ttl: float = 60,
+                 ttls: Dict[str, float] = None):
+        """
+        :param max_size: number of responses to keep, least recently used are dropped
+        :param default_ttl: seconds a response stays fresh
+        :param ttls: seconds a response stays fresh by endpoint pattern (fnmatch style),
+            first matching pattern wins, 0 disables caching of the endpoint
+        """
+        self._max_size = max_size
+        self._default_ttl = default_ttl
+        self._ttls = ttls or {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # invalidations by endpoint: of the endpoint or anything under it, and of the endpoint itself,
+        # responses read before an invalidation of a related endpoint are not stored
+        self._subtree_generations = {}
+        self._endpoint_generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def key(endpoint: str, params: Dict = None, identity: str = None) -> Tuple:
+        """ cache key of a GET request
+        :param identity: session the request is sent with, e.g. its IBM-BA-Authorization
+        """
+        return (endpoint, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())),
+                identity)
+
+    @staticmethod
+    def _prefixes(endpoint: str):
+        """endpoint and the collections containing it, e.g. /a/b/c, /a/b, /a"""
+        endpoint = endpoint.split('?')[0].rstrip('/')
+        while endpoint:
+            yield endpoint
+            endpoint = endpoint.rpartition('/')[0]
+
+    def generation(self, endpoint: str) -> Tuple:
+        """ pass to put() to drop a response read while the endpoint,
+        one of its sub resources or a collection containing it was written to
+        """
+        with self._lock:
+            return self._generation(endpoint)
+
+    def _generation(self, endpoint: str) -> Tuple:
+        prefixes = list(self._prefixes(endpoint))
+        if not prefixes:
+            return 0, 0
+        return (self._subtree_generations.get(prefixes[0], 0),
+                sum(self._endpoint_generations.get(prefix, 0) for prefix in prefixes[1:]))
+
+    def count(self, hit: bool):
+        """count a hit or a miss"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def ttl(self, endpoint: str) -> float:
+        """time to live for the endpoint"""
+        for pattern, ttl in self._ttls.items():
+            if fnmatchcase(endpoint, pattern):
+                return ttl
+        return self._default_ttl
+
+    def get(self, key: Tuple) -> Optional[CacheEntry]:
+        """entry for the key (fresh or not), marking it as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self,
+            key: Tuple,
+            response: RestResponse,
+            etag: str = None,
+            last_modified: str = None,
+            generation: Tuple = None):
+        """ store a response
+        :param generation: (optional) generation(endpoint) when the request was sent,
+            the response is not stored if the endpoint was invalidated since
+        """
+        endpoint = key[0]
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation(endpoint):
+                return
+            self._entries[key] = CacheEntry(endpoint=endpoint,
+                                            response=response,
+                                            expires=time.monotonic() + ttl,
+                                            etag=etag,
+                                            last_modified=last_modified)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key: Tuple):
+        """extend the life of an entry the server confirmed as not modified"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = time.monotonic() + self.ttl(entry.endpoint)
+                self.revalidations += 1
+
+    def invalidate(self, endpoint: str):
+        """ drop the entries of the resource written to, of its sub resources
+        and of the collections containing it
+        """
+        endpoint = endpoint.split('?')[0].rstrip('/')
+        with self._lock:
+            self._endpoint_generations[endpoint] = self._endpoint_generations.get(endpoint, 0) + 1
+            for prefix in self._prefixes(endpoint):
+                self._subtree_generations[prefix] = self._subtree_generations.get(prefix, 0) + 1
+            for key in [key for key, entry in self._entries.items()
+                        if entry.endpoint == endpoint
+                        or entry.endpoint.startswith(endpoint + '/')
+                        or endpoint.startswith(entry.endpoint.rstrip('/') + '/')]:
+                del self._entries[key]
+
+    def clear(self):
+        """drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
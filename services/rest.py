@@ -1,16 +1,19 @@
 """Wrapper for rest calls"""
 import logging
-import json
-from json import JSONDecodeError
+import time
 from typing import Dict
 
 import requests
-from requests_toolbelt.utils import dump
-from requests.adapters import HTTPAdapter
+from requests.adapters import BaseAdapter, HTTPAdapter
 from urllib3.util.retry import Retry
 
 from objects.rest_response import RestResponse
 from exceptions.rest_service_exception import RestServiceException
+from services.response_cache import ResponseCache
+from services.json_codec import JsonCodec, default_codec, is_json
+from services.retry_policy import RetryPolicy, CircuitBreaker
+from services.instrumentation import Instrumentation, RequestMetrics
+from services.rate_limiter import RateLimiter
 
 class RestService:
     """Wrapper service for rest interactions"""
@@ -19,6 +22,13 @@ class RestService:
                  ca_url: str = '',
                  ssl_verify: bool = True,
                  timeout: int = 300,
+                 pool_maxsize: int = 10,
+                 cache: ResponseCache = None,
+                 codec: JsonCodec = None,
+                 retry_policy: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None,
+                 instrumentation: Instrumentation = None,
+                 rate_limiter: RateLimiter = None,
                  logger: logging.Logger = None):
         """
         Constructor for RestService
@@ -26,6 +36,20 @@ class RestService:
         :param ver: always v1
         :param ssl_verify: Normally set to True, but if having SSL/TLS cert validation issues, 
             can turn off with False
+        :param pool_maxsize: number of connections kept open per host,
+            raise it when the session is shared by concurrent workers
+        :param cache: (optional) ResponseCache for GET responses,
+            cached RestResponse objects are shared between callers so treat them as read-only
+        :param codec: (optional) JsonCodec for request and response bodies,
+            defaults to orjson or ujson if installed, standard library json otherwise
+        :param retry_policy: (optional) RetryPolicy for failed requests,
+            share one between services to share the retry budget
+        :param circuit_breaker: (optional) CircuitBreaker to stop sending requests
+            while the server is failing
+        :param instrumentation: (optional) Instrumentation collecting per endpoint metrics,
+            share one between services to get the totals of all of them
+        :param rate_limiter: (optional) RateLimiter capping the request rate and concurrency
+            per endpoint class, share one between the services talking to the same gateway
         :param logger: (optional) If your app has a logger, pass it in here.
         """
         self._logger = logger or logging.getLogger(__name__)
@@ -33,25 +57,154 @@ class RestService:
         self._timeout = timeout
         self._headers = {}
         self._ssl_verify = ssl_verify
+        self._cache = cache
+        self._codec = codec or default_codec()
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._circuit_breaker = circuit_breaker
+        self._instrumentation = instrumentation
+        self._rate_limiter = rate_limiter
         self._session = requests.Session()
-        # setup a retry mechanism on set of error codes
-        # along the lines of 
-        # https://www.peterbe.com/plog/best-practice-with-retries-with-requests
+        # urllib3 only retries failed connections, the request was not sent so it is safe
+        # for every method. Status codes and read errors are retried by the RetryPolicy
         retries = 3
-        retry = Retry(
+        self._retry = Retry(
             total=retries,
-            read=retries,
             connect=retries,
+            read=0,
+            status=0,
             backoff_factor=0.3,
-            status_forcelist=(400, 500, 502, 504),
-            method_whitelist=False,
+            raise_on_status=False,
         )
-        adapter = HTTPAdapter(max_retries=retry)
-        self._session.mount('http://', adapter)
-        self._session.mount('https://', adapter)
+        self.set_pool_maxsize(pool_maxsize)
         if not ssl_verify:
             requests.urllib3.disable_warnings()
 
+    def set_pool_maxsize(self, pool_maxsize: int):
+        """(re)mount the http adapters with a connection pool of the given size"""
+        adapter = HTTPAdapter(max_retries=self._retry,
+                              pool_connections=pool_maxsize,
+                              pool_maxsize=pool_maxsize)
+        self.mount(adapter)
+
+    def mount(self, adapter: BaseAdapter):
+        """ send the http and https requests through the transport adapter,
+        e.g. to record or replay the traffic, see recording.py
+        """
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def get_adapter(self) -> BaseAdapter:
+        """transport adapter of the requests to the server"""
+        return self._session.get_adapter(self.url or 'https://')
+
+    @property
+    def cache(self) -> ResponseCache:
+        """GET response cache, None if caching is off"""
+        return self._cache
+
+    @property
+    def codec(self) -> JsonCodec:
+        """JSON codec of the request and response bodies"""
+        return self._codec
+
+    @property
+    def instrumentation(self) -> Instrumentation:
+        """per endpoint metrics, None if instrumentation is off"""
+        return self._instrumentation
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """request rate and concurrency limits, None if requests are not limited"""
+        return self._rate_limiter
+
+    def _encode(self, data: Dict, headers: Dict) -> tuple:
+        """request body and headers, the body is encoded with the codec"""
+        if data is None:
+            return None, headers
+        return self._codec.dumps(data), dict(headers, **{'Content-Type': 'application/json'})
+
+    def _send(self,
+              http_method: str,
+              full_url: str,
+              params: Dict,
+              body: bytes,
+              headers: Dict,
+              stream: bool = False,
+              metrics: RequestMetrics = None) -> requests.Response:
+        """ send the request, retrying as the RetryPolicy allows
+        and recording the outcomes in the CircuitBreaker
+        and the attempts and their time in metrics, if given
+        every attempt waits for the rate limit of the endpoint, if any
+        """
+        limit = None
+        if self._rate_limiter is not None:
+            limit = self._rate_limiter.limit(full_url[len(self.url):])
+        attempt = 0
+        while True:
+            if self._circuit_breaker is not None:
+                generation = self._circuit_breaker.check()
+            if limit is not None:
+                limit.acquire()
+            self._retry_policy.record_request()
+            if metrics is not None:
+                metrics.attempts += 1
+            start = time.perf_counter()
+            try:
+                response = self._session.request(method=http_method,
+                                                 url=full_url,
+                                                 params=params,
+                                                 data=body,
+                                                 headers=headers,
+                                                 timeout=self._timeout,
+                                                 verify=self._ssl_verify,
+                                                 stream=stream
+                                                 )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+                elapsed = time.perf_counter() - start
+                if metrics is not None:
+                    metrics.network_seconds += elapsed
+                if limit is not None:
+                    limit.release(None, elapsed)
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.record(False, generation)
+                delay = self._retry_policy.delay(http_method, attempt)
+                if delay is None:
+                    raise
+                self._logger.warning('%s %s failed (%s), retrying in %.1fs',
+                                     http_method, full_url, exc, delay)
+            except requests.exceptions.RequestException:
+                if limit is not None:
+                    limit.release(None, time.perf_counter() - start)
+                raise
+            else:
+                elapsed = time.perf_counter() - start
+                if metrics is not None:
+                    metrics.network_seconds += elapsed
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.record(
+                        response.status_code < 500 and response.status_code != 429, generation)
+                delay = self._retry_policy.delay(http_method, attempt, response)
+                if limit is not None:
+                    # a returned stream keeps its slot until the body is read or closed
+                    held = stream and delay is None
+                    limit.release(response.status_code, elapsed, free_slot=not held)
+                    if held:
+                        limit.hold(response)
+                if delay is None:
+                    return response
+                self._logger.warning('%s %s returned %s, retrying in %.1fs',
+                                     http_method, full_url, response.status_code, delay)
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _finish_metrics(self, metrics: RequestMetrics, response: requests.Response = None):
+        """hand the measurements of a request over to the Instrumentation"""
+        if response is not None:
+            metrics.status_code = response.status_code
+            metrics.bytes_in = len(response.content)
+        self._instrumentation.finish(metrics)
+
     def get_http_header(self, key: str) -> str:
         """get header"""
         return self._headers[key]
@@ -62,8 +215,7 @@ class RestService:
 
     def remove_http_header(self, key: str):
         """remove header"""
-        if key in self._headers:
-            self._headers.pop(key)
+        self._headers.pop(key, None)
 
     def get_cookie(self, key: str) -> str:
         """get header"""
@@ -93,45 +245,148 @@ class RestService:
         :return: a Result object
         """
         full_url = self.url + endpoint
+        # a copy, other threads may add or remove headers while the request is sent
+        headers = dict(self._headers)
+        cache_key = cache_entry = cache_generation = None
+        if self._cache is not None:
+            if http_method == 'GET':
+                cache_generation = self._cache.generation(endpoint)
+                cache_key = self._cache.key(endpoint, params,
+                                            identity=headers.get('IBM-BA-Authorization'))
+                cache_entry = self._cache.get(cache_key)
+                if cache_entry is not None:
+                    if cache_entry.expires > time.monotonic():
+                        self._cache.count(hit=True)
+                        return cache_entry.response
+                    headers = dict(headers, **cache_entry.validators())
+                self._cache.count(hit=False)
+            else:
+                self._cache.invalidate(endpoint)
 
-        log_line_pre = f"method={http_method}, url={full_url}, params={params}"
+        body, headers = self._encode(data, headers)
+        metrics = None
+        if self._instrumentation is not None:
+            metrics = self._instrumentation.start(http_method, endpoint, params)
+            metrics.bytes_out = len(body) if body else 0
         # Log HTTP params and perform an HTTP request, catching and re-raising any exceptions
         try:
-            self._logger.debug(msg=log_line_pre)
-            response = self._session.request(method=http_method,
-                                             url=full_url,
-                                             params=params,
-                                             json=data,
-                                             headers=self._headers,
-                                             timeout=self._timeout,
-                                             verify=self._ssl_verify
-                                             )
+            self._logger.debug('method=%s, url=%s, params=%s', http_method, full_url, params)
+            try:
+                response = self._send(http_method, full_url, params, body, headers,
+                                      metrics=metrics)
+            finally:
+                if self._cache is not None and http_method != 'GET':
+                    # again, a GET sent during the write may have cached the old data
+                    self._cache.invalidate(endpoint)
+            # from requests_toolbelt.utils import dump
             # print(dump.dump_all(response).decode("utf-8"))
             response.raise_for_status()
             #TODO: should I pass through all the status codes like 404, etc?
+        except RestServiceException as exc:
+            # not sent, e.g. rejected by the circuit breaker
+            if metrics is not None:
+                metrics.error = str(exc)
+                self._finish_metrics(metrics)
+            raise
         except requests.exceptions.RequestException as exc:
             self._logger.error(msg=str(exc))
-            if response.status_code in [409,500]:
+            response = exc.response
+            if metrics is not None:
+                metrics.error = str(exc)
+                self._finish_metrics(metrics, response)
+            if response is not None and response.status_code in [409,500]:
                   return RestResponse(response.status_code,
                             message=response.reason,
                             data={})
             else:    
-                raise RestServiceException("Request failed") from exc
+                raise RestServiceException(
+                    "Request failed",
+                    status_code=None if response is None else response.status_code) from exc
+        if response.status_code == 304 and cache_entry is not None:
+            if metrics is not None:
+                self._finish_metrics(metrics, response)
+            self._cache.refresh(cache_key)
+            return cache_entry.response
         data_out = {}
         if response.content:
-            # Deserialize JSON output to Python object
-            try:
-                data_out = json.loads(response.content)
-            except (ValueError, JSONDecodeError):
+            if is_json(response.headers.get('Content-Type'), response.content):
+                # Deserialize JSON output to Python object
+                start = time.perf_counter()
+                try:
+                    data_out = self._codec.loads(response.content)
+                except self._codec.decode_error:
+                    # e.g. a gateway error page labelled as JSON
+                    self._logger.warning('method=%s, url=%s: invalid JSON in the response',
+                                         http_method, full_url)
+                    data_out = {'data':response.content}
+                if metrics is not None:
+                    metrics.decode_seconds = time.perf_counter() - start
+            else:
                 # return the whole response content
                 data_out = {'data':response.content}
-                
-        log_line = log_line_pre + \
-            f": status_code={response.status_code}, message={response.reason}"
-        self._logger.debug(msg=log_line)
-        return RestResponse(response.status_code,
-                            message=response.reason,
-                            data=data_out)
+        if metrics is not None:
+            self._finish_metrics(metrics, response)
+
+        self._logger.debug('method=%s, url=%s, params=%s: status_code=%s, message=%s',
+                           http_method, full_url, params, response.status_code, response.reason)
+        rest_response = RestResponse(response.status_code,
+                                     message=response.reason,
+                                     data=data_out)
+        if cache_key is not None and response.status_code == 200:
+            self._cache.put(cache_key, rest_response,
+                            etag=response.headers.get('ETag'),
+                            last_modified=response.headers.get('Last-Modified'),
+                            generation=cache_generation)
+        return rest_response
+
+    def stream(self,
+               http_method: str,
+               endpoint: str,
+               params: Dict = None,
+               data: Dict = None) -> requests.Response:
+        """
+        Perform the request without reading the body,
+        iterate over response.iter_content() and close() the response when done
+        :param http_method: GET, POST, DELETE, etc.
+        :param endpoint: URL Endpoint as a string
+        :param params: Dictionary of Endpoint parameters (Optional)
+        :param data: Dictionary of data to pass to (Optional)
+        :return: requests.Response with unread body
+        """
+        full_url = self.url + endpoint
+        self._logger.debug('method=%s, url=%s, params=%s, stream=True',
+                           http_method, full_url, params)
+        body, headers = self._encode(data, dict(self._headers))
+        metrics = None
+        if self._instrumentation is not None:
+            metrics = self._instrumentation.start(http_method, endpoint, params)
+            metrics.bytes_out = len(body) if body else 0
+        try:
+            response = self._send(http_method, full_url, params, body, headers, stream=True,
+                                  metrics=metrics)
+            response.raise_for_status()
+        except RestServiceException as exc:
+            # not sent, e.g. rejected by the circuit breaker
+            if metrics is not None:
+                metrics.error = str(exc)
+                self._finish_metrics(metrics)
+            raise
+        except requests.exceptions.RequestException as exc:
+            self._logger.error(msg=str(exc))
+            if metrics is not None:
+                metrics.error = str(exc)
+                self._finish_metrics(metrics, exc.response)
+            if exc.response is None:
+                raise RestServiceException("Request failed") from exc
+            exc.response.close()
+            raise RestServiceException("Request failed",
+                                       status_code=exc.response.status_code) from exc
+        if metrics is not None:
+            # the body is not read yet, network_seconds is the time to the response headers
+            metrics.bytes_in = int(response.headers.get('Content-Length') or 0)
+            metrics.status_code = response.status_code
+            self._instrumentation.finish(metrics)
+        return response
 
     def get(self, endpoint: str, params: Dict = None) -> RestResponse:
         """get method wrapper"""
@@ -0,0 +1,199 @@
+"""Retry policy and circuit breaker for RestService
+Retries only when it is safe (idempotent methods, or requests the server refused with 429),
+with jittered exponential backoff, Retry-After and a retry budget shared by all workers,
+and sheds load with a circuit breaker when the error rate spikes
+"""
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+
+from exceptions.rest_service_exception import RestServiceException
+
+
+class RetryBudget:
+    """ Token bucket limiting retries to a fraction of the requests,
+    so retries cannot multiply the load of a struggling server
+    """
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10, max_tokens: float = 100):
+        """
+        :param ratio: retry tokens earned by every request
+        :param min_tokens: tokens available at the start
+        :param max_tokens: upper limit of the saved tokens
+        """
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """a request was sent"""
+        with self._lock:
+            self._tokens = min(self._max_tokens, self._tokens + self._ratio)
+
+    def withdraw(self) -> bool:
+        """take a token for a retry, False if the budget is spent"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """ When and how long to wait before retrying a request
+    share one instance between RestServices (e.g. via SessionPool kwargs)
+    to share the retry budget
+    """
+
+    def __init__(self,
+                 max_attempts: int = 4,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30,
+                 retry_statuses: tuple = (429, 502, 503, 504),
+                 idempotent_methods: tuple = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'),
+                 budget: RetryBudget = None):
+        """
+        :param max_attempts: attempts including the first one
+        :param backoff: base of the exponential backoff in seconds
+        :param max_backoff: upper limit of a wait, also applied to Retry-After
+        :param retry_statuses: status codes worth retrying
+        :param idempotent_methods: methods that are safe to send again,
+            other methods are only retried on 429 (the server did not process them)
+        :param budget: (optional) RetryBudget, a new one by default
+        """
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._retry_statuses = retry_statuses
+        self._idempotent_methods = idempotent_methods
+        self._budget = budget or RetryBudget()
+
+    def record_request(self):
+        """a request was sent, earns retry budget"""
+        self._budget.deposit()
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def delay(self,
+              http_method: str,
+              attempt: int,
+              response: requests.Response = None) -> Optional[float]:
+        """ seconds to wait before retrying, None if the request should not be retried
+        :param attempt: number of the failed attempt, starting at 0
+        :param response: response of the attempt, None if it failed without a response
+        """
+        if attempt + 1 >= self._max_attempts:
+            return None
+        if response is not None and response.status_code not in self._retry_statuses:
+            return None
+        if http_method not in self._idempotent_methods and \
+                (response is None or response.status_code != 429):
+            return None
+        if not self._budget.withdraw():
+            return None
+        retry_after = None if response is None else self._retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self._max_backoff)
+        # full jitter
+        return random.uniform(0, min(self._max_backoff, self._backoff * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """ Stops sending requests for a while when too many of the recent ones failed,
+    then lets a trial request through to see if the server recovered
+    """
+
+    def __init__(self,
+                 failure_rate: float = 0.5,
+                 window: int = 50,
+                 min_requests: int = 20,
+                 reset_timeout: float = 30):
+        """
+        :param failure_rate: share of failed requests in the window that opens the circuit
+        :param window: number of recent requests to look at
+        :param min_requests: requests needed in the window before the circuit can open
+        :param reset_timeout: seconds the circuit stays open before a trial request
+        """
+        self._failure_rate = failure_rate
+        self._min_requests = min_requests
+        self._reset_timeout = reset_timeout
+        self._outcomes = deque(maxlen=window)
+        self._state = 'closed'
+        self._open_until = 0.0
+        # while half open, the trial request is in flight until record() or this time
+        self._trial_until = None
+        # changes with the state and with every trial, outcomes of requests
+        # sent under an earlier generation are ignored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open"""
+        return self._state
+
+    def check(self) -> int:
+        """ raise RestServiceException instead of sending a request while the circuit is open,
+        and while half open for all but the one trial request,
+        returns the generation to pass to record() with the outcome of the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == 'open':
+                if now < self._open_until:
+                    raise RestServiceException('Circuit breaker open, request not sent')
+                self._state = 'half_open'
+                self._trial_until = None
+            if self._state == 'half_open':
+                # a trial that never reported back (e.g. an invalid request) expires
+                if self._trial_until is not None and now < self._trial_until:
+                    raise RestServiceException(
+                        'Circuit breaker half open, waiting for the trial request')
+                self._trial_until = now + self._reset_timeout
+                self._generation += 1
+            return self._generation
+
+    def record(self, success: bool, generation: int = None):
+        """ outcome of a request: False for 5xx, 429 or no response
+        :param generation: (optional) returned by check() before the request was sent,
+            outcomes of requests sent before the circuit last changed are ignored
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if self._state == 'half_open':
+                self._trial_until = None
+                if success:
+                    self._state = 'closed'
+                    self._generation += 1
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self._min_requests and \
+                    self._outcomes.count(False) / len(self._outcomes) >= self._failure_rate:
+                self._trip()
+
+    def _trip(self):
+        self._state = 'open'
+        self._generation += 1
+        self._open_until = time.monotonic() + self._reset_timeout
+        self._outcomes.clear()
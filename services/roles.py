@@ -1,7 +1,8 @@
 """Roles related REST endpoints"""
-from dataclasses import fields
 import logging
+from typing import Iterator
 from services.rest import RestService
+from services.pagination import iter_pages, page_params
 from objects.object import Object
 from objects.role import Role
 from objects.group import Group
@@ -25,24 +26,27 @@ class RolesService:
         """
         response = self._ca_rest.get(
             endpoint=f'{self._base_endpoint}/{role_id}')
-        return Role(
-            **{k:v for k,v in response.data.items() if k in set(f.name for f in fields(Role))}
-            )
+        return Role.from_dict(response.data)
 
     def get_child_roles(self, parent_id='') -> [Role]:
         """ Get roles by namespace folder ID
         https://developer.ibm.com/apis/catalog/cognosanalytics--cognos-analytics-rest-api/api/API--cognosanalytics--cognos-analytics#list_role_objects
         """
-        response = self._ca_rest.get(
-            endpoint=f'{self._base_endpoint}',
-            params={'parent_id': parent_id})
-        roles = []
-        if 'roles' in response.data:
-            for role in response.data['roles']:
-                roles.append(Role(
-                    **{k:v for k,v in role.items() if k in set(f.name for f in fields(Role))}
-                    ))
-        return roles
+        return list(self.iter_child_roles(parent_id=parent_id))
+
+    def iter_child_roles(self,
+                         parent_id='',
+                         page_size: int = None,
+                         prefetch: bool = True) -> Iterator[Role]:
+        """ Lazily list roles by namespace folder ID,
+        paging with page_size roles per request if set, see pagination.iter_pages
+        """
+        def fetch_page(offset, limit):
+            response = self._ca_rest.get(
+                endpoint=f'{self._base_endpoint}',
+                params=page_params({'parent_id': parent_id}, offset, limit))
+            return response.data['roles'] if 'roles' in response.data else []
+        return (Role.from_dict(role) for role in iter_pages(fetch_page, page_size, prefetch))
 
     def get_role_members(self, role: Role) -> Members:
         """ Get role members"""
@@ -51,16 +55,12 @@ class RolesService:
         groups = []
         if 'groups' in response.data:
             for grp in response.data['groups']:
-                groups.append(Group(
-                    **{k:v for k,v in grp.items() if k in set(f.name for f in fields(Group))}
-                    ))
+                groups.append(Group.from_dict(grp))
         users = []
         if 'users' in response.data:
             for usr in response.data['users']:
-                users.append(User(
-                    **{k:v for k,v in usr.items() if k in set(f.name for f in fields(User))}
-                    ))
-        return Members(**{'groups': groups, 'users': users})
+                users.append(User.from_dict(usr))
+        return Members(groups=groups, users=users)
 
     def delete_role(self, role: Role):
         """ delete role
@@ -90,7 +90,7 @@ class RolesService:
                           role: Role,
                           groups_to_add: [Group] = None, 
                           users_to_add: [User] = None):
-        """	adding role members : users & roles
+        """	adding role members : users & roles, returns True if the server accepted them
         """
         self._logger.debug('Adding members to role to %s, roles %s, users %s ',
                            role.defaultName, groups_to_add, users_to_add)
@@ -106,20 +106,22 @@ class RolesService:
                               0 if users_to_add is None else len(users_to_add)
                               +
                               0 if groups_to_add is None else len(groups_to_add), role.defaultName)
-        else:
-            self._logger.error(
-                'Changing role %s members failed:%s', 
-                role.defaultName, response.message, exc_info=1)
+            return True
+        self._logger.error(
+            'Changing role %s members failed:%s', 
+            role.defaultName, response.message, exc_info=1)
+        return False
 
     def remove_role_member(self, role: Role, member: Object, member_type='user'):
-        """	removing specified role member from role
+        """	removing specified role member from role, returns True if it was removed
         https://developer.ibm.com/apis/catalog/cognosanalytics--cognos-analytics-rest-api/api/API--cognosanalytics--cognos-analytics#delete_member_from_role
         """
         response = self._ca_rest.delete(
             endpoint=f"{self._base_endpoint}/{role.id}/members/{member_type}/{member.id}")
-        if response.status_code == 200:
+        if response.status_code in (200, 204):
             self._logger.info('Removed member %s from role %s',
                               member.defaultName, role.defaultName)
-        else:
-            self._logger.error(
-                'Changing role members failed:%s', response.message, exc_info=1)
+            return True
+        self._logger.error(
+            'Changing role members failed:%s', response.message, exc_info=1)
+        return False
@@ -0,0 +1,252 @@
+"""Local queryable index of content security: which objects can a user, group or role access
+Built from the policies of the content objects and group / role memberships,
+kept in the same SQLite file as the ContentSync index so it can be refreshed incrementally
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, List, Tuple
+
+from exceptions.rest_service_exception import RestServiceException
+from services.content import ContentService
+from services.content_sync import ContentSync
+from services.membership_graph import MembershipGraph
+from objects.content_object import ContentObject
+from objects.model import get_attribute
+from objects.object import Object
+from objects.policy import Policy
+
+
+class SecurityIndex:
+    """ Answer access questions locally instead of reading policies over REST
+    usage:
+        index = SecurityIndex(content=ca_service.content, index_path='security_index.db')
+        index.refresh(content_id='team_folders')
+        graph = MembershipGraph(groups=ca_service.groups, roles=ca_service.roles)
+        index.refresh_memberships(graph, ca_service.roles.get_child_roles(parent_id='xOg__'))
+        index.objects_for('CAMID("ns:u:jdoe")', permission='write')
+    Objects without policies of their own inherit the policies of their closest parent,
+    a deny for any of the principals wins over a grant.
+    """
+
+    def __init__(self,
+                 content: ContentService,
+                 index_path: str = 'security_index.db',
+                 logger: logging.Logger = None):
+        """
+        :param content: ContentService to read the content store with
+        :param index_path: SQLite file keeping the index
+        """
+        self._content = content
+        self._logger = logger or logging.getLogger(__name__)
+        self._sync = ContentSync(content=content, index_path=index_path, logger=logger)
+        # one connection for both, SQLite allows a single writer at a time
+        self._db = self._sync.connection
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS policies (
+                object_id TEXT,
+                search_path TEXT,
+                security_type TEXT,
+                permission TEXT,
+                access TEXT);
+            CREATE INDEX IF NOT EXISTS policies_object ON policies (object_id);
+            CREATE INDEX IF NOT EXISTS policies_search_path ON policies (search_path, permission);
+            CREATE TABLE IF NOT EXISTS policy_source (
+                object_id TEXT PRIMARY KEY,
+                source_id TEXT);
+            CREATE INDEX IF NOT EXISTS policy_source_source ON policy_source (source_id);
+            CREATE TABLE IF NOT EXISTS memberships (
+                container TEXT,
+                member TEXT,
+                PRIMARY KEY (container, member));
+            CREATE INDEX IF NOT EXISTS memberships_member ON memberships (member);
+            CREATE TABLE IF NOT EXISTS policy_failures (
+                object_id TEXT PRIMARY KEY);
+            ''')
+        self._db.commit()
+
+    def _store_policies(self, object_id: str, policies: List[Policy]):
+        self._db.execute('DELETE FROM policies WHERE object_id = ?', (object_id,))
+        self._db.executemany('INSERT INTO policies VALUES (?, ?, ?, ?, ?)', [
+            (object_id,
+             get_attribute(policy.securityObject, 'searchPath'),
+             get_attribute(policy.securityObject, 'type'),
+             get_attribute(permission, 'name'),
+             get_attribute(permission, 'access'))
+            for policy in policies or []
+            for permission in policy.permissions])
+
+    def _update_policy_sources(self):
+        """ link every object to the closest object (itself or a parent) with policies"""
+        parents = dict(self._db.execute('SELECT id, parent_id FROM content'))
+        with_policies = {row[0] for row in self._db.execute(
+            'SELECT DISTINCT object_id FROM policies')}
+        sources = {}
+        for object_id in parents:
+            chain = []
+            current = object_id
+            while current is not None and current not in sources \
+                    and current not in with_policies:
+                chain.append(current)
+                current = parents.get(current)
+            source = sources.get(current, current)
+            for item in chain:
+                sources[item] = source
+            if current in with_policies:
+                sources[current] = current
+        self._db.execute('DELETE FROM policy_source')
+        self._db.executemany('INSERT INTO policy_source VALUES (?, ?)',
+                             [(object_id, source) for object_id, source in sources.items()
+                              if object_id in parents and source is not None])
+
+    def refresh(self,
+                content_id: str = 'team_folders',
+                full: bool = False,
+                max_workers: int = 8):
+        """ bring the index up to date with the content store,
+        only the policies of added or changed objects are read again,
+        and of the objects whose policies failed to read before
+        :param content_id: root object to start from
+        :param full: re-read the whole tree instead of the changed folders
+        :param max_workers: number of concurrent requests, split between listing the folders
+            and reading the policies, keep within the pool_maxsize of the RestService
+        """
+        fields_list = ['defaultName', 'modificationTime', 'policies']
+        reads = 0
+        self._db.execute('DELETE FROM policy_failures WHERE object_id NOT IN '
+                         '(SELECT id FROM content) AND object_id != ?', (content_id,))
+        retried = [row[0] for row in self._db.execute('SELECT object_id FROM policy_failures')]
+        # one budget for both: half the requests list folders, the rest read policies
+        list_workers = max(1, max_workers // 2)
+        policy_workers = max(1, max_workers - list_workers)
+        with ThreadPoolExecutor(max_workers=policy_workers) as pool:
+            running = {pool.submit(self._content.get_content, content_id=object_id,
+                                   content_fields_list=fields_list): object_id
+                       for object_id in dict.fromkeys([content_id] + retried)}
+
+            def store(done):
+                for future in done:
+                    object_id = running.pop(future)
+                    try:
+                        self._store_policies(object_id, future.result().policies)
+                    except (RestServiceException, KeyError) as exc:
+                        # keeps the inherited policies until it is read on the next refresh
+                        self._logger.error('Failed to read policies of %s: %s', object_id, exc)
+                        self._db.execute('INSERT OR IGNORE INTO policy_failures VALUES (?)',
+                                         (object_id,))
+                    else:
+                        self._db.execute('DELETE FROM policy_failures WHERE object_id = ?',
+                                         (object_id,))
+
+            for change in self._sync.sync(content_id=content_id, full=full,
+                                          max_workers=list_workers):
+                object_id = change.content_object.id
+                if change.event == 'deleted':
+                    self._db.execute('DELETE FROM policies WHERE object_id = ?', (object_id,))
+                    self._db.execute('DELETE FROM policy_failures WHERE object_id = ?',
+                                     (object_id,))
+                    continue
+                running[pool.submit(self._content.get_content, content_id=object_id,
+                                    content_fields_list=fields_list)] = object_id
+                reads += 1
+                # queued reads wait for a policy worker, they are not in flight
+                if len(running) >= policy_workers * 2:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    store(done)
+            store(list(running))
+        self._update_policy_sources()
+        self._db.commit()
+        failures = self._db.execute('SELECT COUNT(*) FROM policy_failures').fetchone()[0]
+        self._logger.info('Security index of %s refreshed, read policies of %d objects, '
+                          '%d to read again next time', content_id, reads + len(retried), failures)
+
+    def refresh_memberships(self, graph: MembershipGraph, containers: Iterable[Object]):
+        """ read the members of the groups and roles, and of their nested groups,
+        and replace the memberships of the ones read in the index.
+        Groups and roles that failed to read keep their previous members
+        :param graph: MembershipGraph to read the members with, its ttl applies
+        :param containers: Group and Role objects, e.g. all the roles of the namespace
+        """
+        graph.load(containers)
+        count = 0
+        for container, members in graph.direct_memberships():
+            self._db.execute('DELETE FROM memberships WHERE container = ?',
+                             (container.searchPath,))
+            self._db.executemany('INSERT OR IGNORE INTO memberships VALUES (?, ?)',
+                                 [(container.searchPath, member.searchPath)
+                                  for member in members.users + members.groups])
+            count += 1
+        self._db.commit()
+        self._logger.info('Security index memberships of %d groups and roles refreshed', count)
+
+    def set_members(self, container: str, members: Iterable[str]):
+        """ replace the direct members of a group or role, e.g. from another directory
+        :param container: searchPath of the group or role
+        :param members: searchPaths of the member users, groups and roles
+        """
+        self._db.execute('DELETE FROM memberships WHERE container = ?', (container,))
+        self._db.executemany('INSERT OR IGNORE INTO memberships VALUES (?, ?)',
+                             [(container, member) for member in members])
+        self._db.commit()
+
+    def principals(self, search_path: str) -> List[str]:
+        """ the searchPath itself and all the groups and roles it is a member of,
+        directly or through other groups and roles
+        """
+        return [row[0] for row in self._db.execute('''
+            WITH RECURSIVE principals(search_path) AS (
+                SELECT ?
+                UNION
+                SELECT memberships.container FROM memberships
+                JOIN principals ON memberships.member = principals.search_path)
+            SELECT search_path FROM principals''', (search_path,))]
+
+    def objects_for(self,
+                    search_path: str,
+                    permission: str = 'read',
+                    include_memberships: bool = True) -> List[ContentObject]:
+        """ content objects the user, group or role has the permission on
+        :param search_path: searchPath of the user, group or role
+        :param permission: read, write, execute, setPolicy or traverse
+        :param include_memberships: also count the policies of the groups and roles
+            the search_path is a member of
+        """
+        principals = self.principals(search_path) if include_memberships else [search_path]
+        placeholders = ','.join('?' * len(principals))
+        rows = self._db.execute(f'''
+            SELECT content.id, content.type, content.defaultName, content.modificationTime
+            FROM content
+            JOIN policy_source ON policy_source.object_id = content.id
+            JOIN policies ON policies.object_id = policy_source.source_id
+            WHERE policies.permission = ? AND policies.search_path IN ({placeholders})
+            GROUP BY content.id
+            HAVING SUM(policies.access = 'deny') = 0''', [permission] + principals)
+        return [ContentObject(id=row[0], type=row[1], defaultName=row[2],
+                              modificationTime=row[3]) for row in rows]
+
+    def access_to(self, object_id: str) -> Dict[str, Dict[str, str]]:
+        """ effective policies of an object: {searchPath: {permission: access}}"""
+        access = {}
+        for search_path, permission, value in self._db.execute('''
+                SELECT policies.search_path, policies.permission, policies.access
+                FROM policy_source
+                JOIN policies ON policies.object_id = policy_source.source_id
+                WHERE policy_source.object_id = ?''', (object_id,)):
+            access.setdefault(search_path, {})[permission] = value
+        return access
+
+    def has_access(self, search_path: str, object_id: str, permission: str = 'read') -> bool:
+        """ does the user, group or role have the permission on the object"""
+        principals = set(self.principals(search_path))
+        accesses = [permissions.get(permission) for principal, permissions
+                    in self.access_to(object_id).items() if principal in principals]
+        return 'grant' in accesses and 'deny' not in accesses
+
+    def policies_by_search_path(self, search_path: str) -> List[Tuple[str, str, str]]:
+        """ explicit policies set for the searchPath: (object id, permission, access)"""
+        return list(self._db.execute(
+            'SELECT object_id, permission, access FROM policies WHERE search_path = ?',
+            (search_path,)))
+
+    def close(self):
+        """close the index"""
+        self._sync.close()
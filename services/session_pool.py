@@ -0,0 +1,249 @@
+"""Pool of authenticated Cognos Analytics sessions
+Spreads requests round-robin across several logged in sessions
+and logs a session in again when it expires
+"""
+import itertools
+import logging
+import threading
+from typing import Callable, Dict, List
+
+import requests
+
+from exceptions.rest_service_exception import RestServiceException
+from objects.rest_response import RestResponse
+from services.rest import RestService
+from services.cognos_analytics import CognosAnalyticsService
+
+# status codes of an expired or invalid session
+SESSION_EXPIRED_STATUS = (401, 441)
+# headers that belong to one session, set by the logins
+SESSION_HEADERS = ('IBM-BA-Authorization', 'X-XSRF-Token')
+
+
+class PooledSession:
+    """ one RestService of the pool with the ways to log it in"""
+
+    def __init__(self, rest: RestService, login: Callable[[CognosAnalyticsService], None]):
+        self.rest = rest
+        self._logins = [login]
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def login(self, expired_generation: int = None):
+        """ log in, unless another thread already did it after the session expired,
+        running the added logins (e.g. the rds logon) after the first one
+        """
+        with self._lock:
+            if expired_generation is not None and expired_generation != self.generation:
+                return
+            for key in SESSION_HEADERS:
+                self.rest.remove_http_header(key)
+            ca_service = CognosAnalyticsService(rest=self.rest)
+            self._logins[0](ca_service)
+            try:
+                self.rest.get_http_header('IBM-BA-Authorization')
+            except KeyError as exc:
+                raise RestServiceException('Session login failed') from exc
+            for login in self._logins[1:]:
+                login(ca_service)
+            self.generation += 1
+
+    def add_login(self, login: Callable[[CognosAnalyticsService], None]):
+        """ run one more login on this session, now and whenever it logs in again"""
+        with self._lock:
+            login(CognosAnalyticsService(rest=self.rest))
+            self._logins.append(login)
+
+
+class SessionPool:
+    """ Drop-in replacement for RestService that spreads the requests across sessions
+    usage:
+        pool = SessionPool.with_api_keys(['key1', 'key2'], ca_url='https://...:9300')
+        pool.add_login(lambda ca: ca.report_data.login(namespace, user, password))
+        ca_service = CognosAnalyticsService(rest=pool)
+    Log the sessions in with the logins and add_login, a login called on a service
+    of the pool (e.g. ca_service.login) only logs in the session that answered it:
+    the session headers and cookies are read and set on the session that served
+    the last request of the thread
+    """
+
+    def __init__(self,
+                 logins: List[Callable[[CognosAnalyticsService], None]],
+                 logger: logging.Logger = None,
+                 **kwargs):
+        """
+        :param logins: one callable per session, logging the given CognosAnalyticsService in,
+            e.g. lambda ca: ca.login_with_api_key(api_key=key)
+        :param kwargs: RestService arguments, e.g. ca_url or pool_maxsize
+        """
+        self._logger = logger or logging.getLogger(__name__)
+        self._sessions = [PooledSession(RestService(logger=logger, **kwargs), login)
+                          for login in logins]
+        self._cycle = itertools.cycle(self._sessions)
+        self._cycle_lock = threading.Lock()
+        # session of the last request of every thread
+        self._local = threading.local()
+        self.url = self._sessions[0].rest.url
+        for session in self._sessions:
+            session.login()
+        self._logger.info('Logged in %d Cognos Analytics sessions', len(self._sessions))
+
+    @classmethod
+    def with_api_keys(cls, api_keys: List[str], **kwargs) -> 'SessionPool':
+        """ one session per API key"""
+        return cls(logins=[lambda ca, key=key: ca.login_with_api_key(api_key=key)
+                           for key in api_keys], **kwargs)
+
+    @classmethod
+    def with_credentials(cls,
+                         namespace: str,
+                         user: str,
+                         password: str,
+                         size: int = 4,
+                         **kwargs) -> 'SessionPool':
+        """ size sessions of the same user"""
+        return cls(logins=[lambda ca: ca.login(namespace=namespace, user=user,
+                                               password=password)] * size, **kwargs)
+
+    @property
+    def sessions(self) -> List[RestService]:
+        """RestService of every session"""
+        return [session.rest for session in self._sessions]
+
+    @property
+    def cache(self):
+        """GET response cache of the first session"""
+        return self._sessions[0].rest.cache
+
+    @property
+    def codec(self):
+        """JSON codec of the first session"""
+        return self._sessions[0].rest.codec
+
+    @property
+    def instrumentation(self):
+        """per endpoint metrics of the first session, pass one Instrumentation
+        in the kwargs to collect the totals of all the sessions"""
+        return self._sessions[0].rest.instrumentation
+
+    @property
+    def rate_limiter(self):
+        """request limits of the first session, pass one RateLimiter
+        in the kwargs to share the limits between the sessions"""
+        return self._sessions[0].rest.rate_limiter
+
+    def add_login(self, login: Callable[[CognosAnalyticsService], None]):
+        """ run one more login on every session, now and whenever it logs in again,
+        e.g. lambda ca: ca.report_data.login(namespace, user, password)
+        for the XSRF token of the session
+        """
+        for session in self._sessions:
+            session.add_login(login)
+
+    def mount(self, adapter):
+        """ send the requests of every session through the transport adapter,
+        e.g. to record or replay the traffic, see recording.py
+        """
+        for session in self._sessions:
+            session.rest.mount(adapter)
+
+    def get_adapter(self):
+        """transport adapter of the requests of the first session"""
+        return self._sessions[0].rest.get_adapter()
+
+    def _next(self) -> PooledSession:
+        with self._cycle_lock:
+            session = next(self._cycle)
+        self._local.session = session
+        return session
+
+    def _current(self) -> PooledSession:
+        """session of the last request of the thread, the first one before any request"""
+        return getattr(self._local, 'session', self._sessions[0])
+
+    def _call(self, method: str, **kwargs):
+        """ run the call on the next session, logging it in again and retrying once
+        if the session expired
+        """
+        session = self._next()
+        generation = session.generation
+        try:
+            return getattr(session.rest, method)(**kwargs)
+        except RestServiceException as exc:
+            if exc.status_code not in SESSION_EXPIRED_STATUS:
+                raise
+            self._logger.info('Cognos Analytics session expired (%s), logging in again',
+                              exc.status_code)
+            session.login(expired_generation=generation)
+            return getattr(session.rest, method)(**kwargs)
+
+    def get(self, endpoint: str, params: Dict = None) -> RestResponse:
+        """get method wrapper"""
+        return self._call('get', endpoint=endpoint, params=params)
+
+    def post(self, endpoint: str, params: Dict = None, data: Dict = None) -> RestResponse:
+        """post method wrapper"""
+        return self._call('post', endpoint=endpoint, params=params, data=data)
+
+    def put(self, endpoint: str, params: Dict = None, data: Dict = None) -> RestResponse:
+        """put method wrapper"""
+        return self._call('put', endpoint=endpoint, params=params, data=data)
+
+    def delete(self, endpoint: str, params: Dict = None, data: Dict = None) -> RestResponse:
+        """delete method wrapper"""
+        return self._call('delete', endpoint=endpoint, params=params, data=data)
+
+    def stream(self,
+               http_method: str,
+               endpoint: str,
+               params: Dict = None,
+               data: Dict = None) -> requests.Response:
+        """stream method wrapper"""
+        return self._call('stream', http_method=http_method, endpoint=endpoint,
+                          params=params, data=data)
+
+    def set_pool_maxsize(self, pool_maxsize: int):
+        """connection pool size of every session"""
+        for session in self._sessions:
+            session.rest.set_pool_maxsize(pool_maxsize)
+
+    def get_http_header(self, key: str) -> str:
+        """get header of the session of the last request"""
+        return self._current().rest.get_http_header(key)
+
+    def add_http_header(self, key: str, value: str):
+        """add header to every session, session headers only to the session
+        of the last request"""
+        if key in SESSION_HEADERS:
+            self._current().rest.add_http_header(key, value)
+            return
+        for session in self._sessions:
+            session.rest.add_http_header(key, value)
+
+    def remove_http_header(self, key: str):
+        """remove header from every session, session headers only from the session
+        of the last request"""
+        if key in SESSION_HEADERS:
+            self._current().rest.remove_http_header(key)
+            return
+        for session in self._sessions:
+            session.rest.remove_http_header(key)
+
+    def get_cookie(self, key: str) -> str:
+        """get cookie of the session of the last request"""
+        return self._current().rest.get_cookie(key)
+
+    def add_cookie(self, key: str, value: str):
+        """add cookie to every session"""
+        for session in self._sessions:
+            session.rest.add_cookie(key, value)
+
+    def remove_cookie(self, key: str):
+        """remove cookie from every session"""
+        for session in self._sessions:
+            session.rest.remove_cookie(key)
+
+    def logout(self):
+        """log out every session"""
+        for session in self._sessions:
+            CognosAnalyticsService(rest=session.rest).logout()
@@ -1,8 +1,52 @@
 """User related Cognos Analytics Rest API calls"""
-from dataclasses import fields
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
 from services.rest import RestService
+from services.pagination import iter_pages, page_params
+from exceptions.rest_service_exception import RestServiceException
 from objects.user import User
+from objects.user_provision_result import UserProvisionResult
+from objects.provisioning_summary import ProvisioningSummary
+from objects.profile_copy_report import ProfileCopyReport
+
+# status codes of failed user adds worth another attempt, None is no response at all.
+# 429 is left out: the RetryPolicy of the RestService already retries it for POST,
+# and never retries these, so every failure is retried at one layer only
+TRANSIENT_STATUS = (None, 500, 502, 503, 504)
+# fields of a bulk provisioning record
+RECORD_FIELDS = ('namespace', 'identity', 'defaultName')
+# end of the records
+_END = object()
+
+
+def _provision_record(record: Union[tuple, dict]) -> tuple:
+    """ (namespace, identity, defaultName) of a bulk provisioning record,
+    ValueError if it is malformed
+    """
+    if isinstance(record, dict):
+        missing = [key for key in RECORD_FIELDS if key not in record]
+        if missing:
+            raise ValueError(f'missing {", ".join(missing)}')
+        record = tuple(record[key] for key in RECORD_FIELDS)
+    elif not isinstance(record, (tuple, list)) or len(record) != len(RECORD_FIELDS):
+        raise ValueError(f'expected (namespace, identity, defaultName), got {record!r}')
+    if not all(isinstance(value, str) and value for value in record):
+        raise ValueError(f'empty or non-string values in {tuple(record)!r}')
+    return tuple(record)
+
+
+def _invalid_record_result(record, error: Exception) -> UserProvisionResult:
+    """failed result of a record that was not sent"""
+    if isinstance(record, dict):
+        values = [record.get(key) for key in RECORD_FIELDS]
+    elif isinstance(record, (tuple, list)):
+        values = (list(record) + [None] * len(RECORD_FIELDS))[:len(RECORD_FIELDS)]
+    else:
+        values = [None, record, None]
+    return UserProvisionResult(*values, status='failed', attempts=0,
+                               error=f'invalid record: {error}')
 
 class UsersService:
     """ Users related endpoints
@@ -17,16 +61,21 @@ class UsersService:
     def get_users(self, identifier="") -> [User]:
         """ List existing users with the given user identifier.
         """
-        response = self._ca_rest.get(
-            endpoint=f'{self._base_endpoint}',
-            params={'identifier':identifier})
-        users = []
-        if 'users' in response.data:
-            for usr in response.data['users']:
-                users.append(User(
-                    **{k:v for k,v in usr.items() if k in set(f.name for f in fields(User))}
-                    ))
-        return users
+        return list(self.iter_users(identifier=identifier))
+
+    def iter_users(self,
+                   identifier="",
+                   page_size: int = None,
+                   prefetch: bool = True) -> Iterator[User]:
+        """ Lazily list existing users with the given user identifier,
+        paging with page_size users per request if set, see pagination.iter_pages
+        """
+        def fetch_page(offset, limit):
+            response = self._ca_rest.get(
+                endpoint=f'{self._base_endpoint}',
+                params=page_params({'identifier':identifier}, offset, limit))
+            return response.data['users'] if 'users' in response.data else []
+        return (User.from_dict(usr) for usr in iter_pages(fetch_page, page_size, prefetch))
 
     def add_user (self, 
                   namespace:str, 
@@ -46,6 +95,100 @@ class UsersService:
         else:
             self._logger.error("Couldn't add %s:%s to %s",identity,defaultName,namespace)
 
+    def _provision_user(self,
+                        namespace: str,
+                        identity: str,
+                        defaultName: str,
+                        retries: int,
+                        backoff: float) -> UserProvisionResult:
+        """ add one user, retrying 5xx and no response, which the RestService does not retry
+        for POST, a retried add that reached the server the first time is reported as exists
+        """
+        data = {'defaultName':defaultName, 'identity':identity}
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._ca_rest.post(endpoint=f'{self._base_endpoint}',
+                                              params={'namespace':namespace}, data=data)
+                status, error = response.status_code, response.message
+            except RestServiceException as exc:
+                status, error = exc.status_code, str(exc)
+            if status == 201:
+                return UserProvisionResult(namespace, identity, defaultName, 'created', attempt)
+            if status == 409:
+                return UserProvisionResult(namespace, identity, defaultName, 'exists', attempt)
+            if status in TRANSIENT_STATUS and attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1))
+                continue
+            return UserProvisionResult(namespace, identity, defaultName, 'failed', attempt,
+                                       error=f'{status}: {error}')
+
+    @staticmethod
+    def _add_result(summary: ProvisioningSummary,
+                    result: UserProvisionResult,
+                    on_result: Callable[[UserProvisionResult], None]):
+        summary.add(result)
+        if on_result is not None:
+            on_result(result)
+
+    def add_users_bulk(self,
+                       records: Iterable[Union[tuple, dict]],
+                       max_workers: int = 8,
+                       retries: int = 3,
+                       backoff: float = 1,
+                       on_result: Callable[[UserProvisionResult], None] = None
+                       ) -> ProvisioningSummary:
+        """ add many users, up to max_workers at once, reading the records lazily
+        so a generator (e.g. over an LDAP export) is never held in memory as a whole
+        :param records: (namespace, identity, defaultName) tuples
+            or dicts with these keys
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        :param retries: extra attempts for a user on 5xx or no response,
+            429 is retried by the RetryPolicy of the RestService
+        Malformed records are not sent, they are reported as failed results
+        :param backoff: seconds before the first retry, doubled for every further one
+        :param on_result: (optional) called with every UserProvisionResult as it completes,
+            e.g. to write a progress file
+        :return: counts of created, exists and failed users, retries, throughput
+            and the failed records
+        """
+        summary = ProvisioningSummary()
+        start = time.monotonic()
+        records = iter(records)
+        running = set()
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while True:
+                # keep the pool busy without reading ahead more than two records per worker,
+                # invalid records are reported at once and do not take a place
+                while not exhausted and len(running) < 2 * max_workers:
+                    record = next(records, _END)
+                    if record is _END:
+                        exhausted = True
+                        break
+                    try:
+                        values = _provision_record(record)
+                    except ValueError as exc:
+                        self._logger.error('Skipping invalid user record: %s', exc)
+                        self._add_result(summary, _invalid_record_result(record, exc), on_result)
+                        continue
+                    running.add(pool.submit(self._provision_user, *values,
+                                            retries=retries, backoff=backoff))
+                # only empty once the records are exhausted
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._add_result(summary, future.result(), on_result)
+        summary.elapsed = time.monotonic() - start
+        self._logger.info('Provisioned %d users in %.1fs (%.0f/s): %d created, %d existed, '
+                          '%d failed, %d retries', summary.total, summary.elapsed,
+                          summary.per_second, summary.created, summary.exists, summary.failed,
+                          summary.retries)
+        return summary
+
     def delete_user (self, user:User):
         """	delete user by id
         """
@@ -83,4 +226,78 @@ class UsersService:
                               source_user.defaultName,
                               [usr.defaultName for usr in target_user_list],
                               response.data['succesList'])
-            
\ No newline at end of file
+
+    def _copy_profile_chunk(self,
+                            source_user: User,
+                            target_ids: List[str],
+                            options: dict) -> Tuple[List[str], List[str]]:
+        """ copy the profile to one chunk of targets, returns (succeeded ids, failed ids)
+        all the targets of the chunk fail if the request does
+        """
+        body = dict(options, targetUsers=target_ids)
+        try:
+            response = self._ca_rest.post(
+                endpoint=f"{self._base_endpoint}/{source_user.id}/copy_profile",
+                params={},
+                data=body)
+        except RestServiceException as exc:
+            self._logger.warning('Copying profile to %d users failed: %s', len(target_ids), exc)
+            return [], target_ids
+        if response.status_code != 200 or not isinstance(response.data, dict):
+            self._logger.warning('Copying profile to %d users failed: %s',
+                                 len(target_ids), response.message)
+            return [], target_ids
+        def ids(key):
+            return [item['id'] if isinstance(item, dict) else item
+                    for item in response.data.get(key) or []]
+        failed = ids('failedList')
+        failed_ids = set(failed)
+        # targets missing from both lists are taken as copied
+        return [target for target in target_ids if target not in failed_ids], failed
+
+    def copy_user_profile_chunked(self,
+                                  source_user: User,
+                                  target_user_list: [User],
+                                  copy_folders: bool = True,
+                                  copy_pages: bool = True,
+                                  copy_preferences: bool = True,
+                                  chunk_size: int = 100,
+                                  max_workers: int = 4,
+                                  retries: int = 2) -> ProfileCopyReport:
+        """ copy source user profile to many target users, chunk_size targets per request
+        and up to max_workers requests at once. Only the targets that failed are sent again,
+        in chunks half the size of the previous round, up to retries more rounds
+        :param chunk_size: targets per request
+        :param max_workers: number of concurrent requests,
+            keep within the pool_maxsize of the RestService
+        :param retries: extra rounds for the failed targets
+        :return: succeeded and failed target ids with request counts and elapsed time
+        """
+        options = {'folders':copy_folders, 'pages':copy_pages, 'preferences':copy_preferences}
+        report = ProfileCopyReport(source_id=source_user.id)
+        start = time.monotonic()
+        pending = list(dict.fromkeys(usr.id for usr in target_user_list))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending and report.rounds <= retries:
+                report.rounds += 1
+                chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+                report.requests += len(chunks)
+                pending = []
+                for succeeded, failed in pool.map(
+                        lambda chunk: self._copy_profile_chunk(source_user, chunk, options),
+                        chunks):
+                    report.succeeded.extend(succeeded)
+                    pending.extend(failed)
+                if pending and report.rounds <= retries:
+                    self._logger.info('Retrying the profile copy to %d users', len(pending))
+                chunk_size = max(1, chunk_size // 2)
+        report.failed = pending
+        report.elapsed = time.monotonic() - start
+        if report.failed:
+            self._logger.error('User profile copy from %s failed for %d of %d users: %s',
+                               source_user.defaultName, len(report.failed),
+                               len(report.failed) + len(report.succeeded), report.failed)
+        else:
+            self._logger.info('Copied user profile from %s to %d users in %.1fs',
+                              source_user.defaultName, len(report.succeeded), report.elapsed)
+        return report
@@ -0,0 +1,34 @@
+"""ReportScheduler against the local mock Cognos server
+run from the repository root:
+    python -m unittest discover tests
+"""
+import unittest
+
+from benchmarks.mock_server import MockCognosServer
+from objects.report_job import ReportJob
+from services.cognos_analytics import CognosAnalyticsService
+from services.report_scheduler import ReportScheduler
+
+
+class ReportSchedulerTest(unittest.TestCase):
+
+    def test_polls_until_the_report_is_ready(self):
+        with MockCognosServer(report_rows=50, report_polls=2) as server:
+            ca_service = CognosAnalyticsService(ca_url=server.url)
+            ca_service.login(namespace='LDAP', user='admin', password='secret')
+            scheduler = ReportScheduler({'disp': ca_service.report_data},
+                                        max_per_dispatcher=2, poll_interval=0.01)
+            jobs = scheduler.run([ReportJob(priority=0, reportid='report',
+                                            prompts={'Region': 'Region 1'}),
+                                  ReportJob(priority=1, reportid='report', row_limit=10)])
+            # the submit only answers 202, the third poll of every conversation returns the output
+            self.assertEqual(server.data.report_waits, 6)
+            self.assertEqual(server.data.conversations, {})
+            self.assertIn({'p_Region': 'Region 1'}, server.data.report_prompts)
+        self.assertEqual([job.status for job in jobs], ['done', 'done'])
+        self.assertEqual([len(job.result['dataSet']['dataTable'][0]['row']) for job in jobs],
+                         [50, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()